@@ -1,50 +1,453 @@
+import io
+import logging
 import os
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, send_file
+from flask import Flask, Response, abort, render_template, request, redirect, url_for, flash, jsonify, send_from_directory
 from werkzeug.utils import secure_filename
 from dotenv import load_dotenv
 import uuid
 import json
+import shutil
+import hashlib
+import atexit
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime
+from itertools import repeat
 
-# Import local modules
-from processors.extractors.pdf_extractor import PDFExtractor
-from processors.nlp.document_analyzer import DocumentAnalyzer
-from processors.generators.form_generator import FormGenerator
+# Import local modules (the processors are imported on first use, so routes
+# that don't process documents never load the PDF and NLP libraries)
 from utils.config_loader import ConfigLoader
+from utils.analysis_cache import AnalysisCache
+from utils.template_cache import TemplateCache
+from utils import json_utils
 from models.document import Document
 from models.template import Template
 
+logger = logging.getLogger(__name__)
+
 # Load environment variables
 load_dotenv()
 
 app = Flask(__name__)
 app.secret_key = os.getenv('SECRET_KEY', 'dev_key_for_development')
 
+# Reject requests larger than this before reading them (unlimited if unset)
+if os.getenv('MAX_CONTENT_LENGTH'):
+    app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('MAX_CONTENT_LENGTH'))
+
+# Let the front-end web server send downloads (X-Sendfile) instead of Python
+app.config['USE_X_SENDFILE'] = os.getenv('USE_X_SENDFILE', 'False').lower() == 'true'
+
 # Configure upload folders
 UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
 TEMP_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'temp')
 RESULT_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
 TEMPLATE_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+CACHE_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache')
 
 # Ensure directories exist
-for folder in [UPLOAD_FOLDER, TEMP_FOLDER, RESULT_FOLDER]:
+for folder in [UPLOAD_FOLDER, TEMP_FOLDER, RESULT_FOLDER, CACHE_FOLDER]:
     os.makedirs(folder, exist_ok=True)
 
 # Setup file restrictions
-ALLOWED_DOCUMENT_EXTENSIONS = {'pdf'}
-ALLOWED_TEMPLATE_EXTENSIONS = {'docx', 'json'}
+ALLOWED_DOCUMENT_EXTENSIONS = frozenset({'.pdf'})
+ALLOWED_TEMPLATE_EXTENSIONS = frozenset({'.docx', '.json'})
+
+# Buffer size used when copying uploads to disk
+UPLOAD_CHUNK_SIZE = 1024 * 1024
 
 # Initialize components
-config = ConfigLoader('config/extraction_config.json')
-pdf_extractor = PDFExtractor()
-document_analyzer = DocumentAnalyzer(config.get_nlp_config())
-form_generator = FormGenerator()
+REGEX_ENGINE = os.getenv('REGEX_ENGINE', 're')
+PDF_BACKEND = os.getenv('PDF_BACKEND', 'pymupdf')
+PDF_MODE = os.getenv('PDF_MODE', 'text-only')
+config = ConfigLoader('config/extraction_config.json', engine=REGEX_ENGINE)
+
+# Processing components are created lazily in each process that uses them,
+# so worker processes build their own instead of pickling spaCy models
+pdf_extractor = None
+document_analyzer = None
+form_generator = None
+
+# Modules whose code decides the extracted and analyzed results
+ANALYSIS_SOURCES = (
+    'processors/extractors/pdf_extractor.py',
+    'processors/nlp/document_analyzer.py',
+    'utils/config_loader.py',
+    'utils/hyperscan_loader.py',
+    'utils/normalize.py',
+    'utils/pattern_utils.py'
+)
+
+def analysis_fingerprint():
+    """
+    Fingerprint everything besides the document that decides its analysis
+    
+    That is the extraction configuration, the regex engine, the PDF backend
+    and mode, and the source of the extraction and analysis code, so that
+    changing any of them invalidates cached results.
+    
+    Returns:
+        str: The fingerprint
+    """
+    code = hashlib.sha256()
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    for source in ANALYSIS_SOURCES:
+        with open(os.path.join(base_dir, source), 'rb') as f:
+            code.update(f.read())
+    
+    return json.dumps({
+        'config': config.get_config(),
+        'regex_engine': REGEX_ENGINE,
+        'pdf_backend': PDF_BACKEND,
+        'pdf_mode': PDF_MODE,
+        'code': code.hexdigest()
+    }, sort_keys=True)
+
+# Analysis results are cached by document content, salted with the analysis
+# fingerprint, and limited to the most recently used results
+analysis_cache = AnalysisCache(
+    CACHE_FOLDER,
+    salt=analysis_fingerprint(),
+    max_entries=int(os.getenv('ANALYSIS_CACHE_MAX_ENTRIES', 10000))
+)
+
+# Parsed templates, keyed by the hash of their content
+template_cache = TemplateCache(maxsize=32)
+
+# Worker pool for document processing, created on first use
+MAX_WORKERS = int(os.getenv('MAX_WORKERS', os.cpu_count() or 1))
+executor = None
+
+# Number of documents extracted, analyzed and rendered together
+PROCESS_BATCH_SIZE = int(os.getenv('PROCESS_BATCH_SIZE', 16))
+
+# Job summaries are written in the background so responses don't wait on
+# them; pending writes are flushed before the process exits
+summary_writer = ThreadPoolExecutor(max_workers=1)
+atexit.register(summary_writer.shutdown, wait=True)
+
+# Hand processing off to the Celery task queue when a broker is configured
+USE_CELERY = bool(os.getenv('CELERY_BROKER_URL'))
+
+def get_pdf_extractor():
+    """
+    Get the PDF extractor for the current process, creating it if needed
+    """
+    global pdf_extractor
+    
+    if pdf_extractor is None:
+        from processors.extractors.pdf_extractor import PDFExtractor
+        pdf_extractor = PDFExtractor(backend=PDF_BACKEND, mode=PDF_MODE)
+    return pdf_extractor
+
+def get_document_analyzer():
+    """
+    Get the document analyzer for the current process, creating it if needed
+    """
+    global document_analyzer
+    
+    if document_analyzer is None:
+        from processors.nlp.document_analyzer import DocumentAnalyzer
+        nlp_config = config.get_nlp_config()
+        nlp_config['compiled_patterns'] = config.get_compiled_patterns()
+        if os.getenv('SPACY_BATCH_SIZE'):
+            nlp_config['spacy_batch_size'] = int(os.getenv('SPACY_BATCH_SIZE'))
+        if os.getenv('SPACY_N_PROCESS'):
+            nlp_config['spacy_n_process'] = int(os.getenv('SPACY_N_PROCESS'))
+        document_analyzer = DocumentAnalyzer(nlp_config)
+    return document_analyzer
+
+def get_form_generator():
+    """
+    Get the form generator for the current process, creating it if needed
+    """
+    global form_generator
+    
+    if form_generator is None:
+        from processors.generators.form_generator import FormGenerator
+        form_generator = FormGenerator()
+    return form_generator
 
-def allowed_document_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_DOCUMENT_EXTENSIONS
+def init_components():
+    """
+    Initialize all processing components for the current process
+    """
+    get_pdf_extractor()
+    get_document_analyzer().load_spacy_model()
+    get_form_generator()
 
-def allowed_template_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_TEMPLATE_EXTENSIONS
+def get_executor():
+    """
+    Get the shared document processing pool, creating it if needed
+    """
+    global executor
+    
+    if executor is None:
+        executor = ProcessPoolExecutor(max_workers=MAX_WORKERS)
+    return executor
+
+def extract_single_document(doc_path):
+    """
+    Extract a single document, unless its analysis is already cached
+    
+    The text, metadata and form fields are all read from one open PDF. Runs in
+    a worker process, so it reports failures in the returned record instead
+    of raising.
+    
+    Args:
+        doc_path (str): Path to the saved PDF document
+        
+    Returns:
+        dict: The document's 'content_hash' and either its cached
+              'extracted_data' or its extracted 'text', 'metadata' and
+              'form_fields', or an 'error'
+    """
+    try:
+        # Reuse the analysis of an identical document if we have one
+        content_hash = analysis_cache.hash_file(doc_path)
+        extracted_data = analysis_cache.get(content_hash)
+        if extracted_data is not None:
+            return {'content_hash': content_hash, 'extracted_data': extracted_data}
+            
+        extracted = get_pdf_extractor().extract_all(doc_path)
+        
+        # PyPDF2 values are PDF objects; keep them as plain strings
+        return {
+            'content_hash': content_hash,
+            'text': extracted['text'],
+            'metadata': {k: v if isinstance(v, int) else str(v) for k, v in extracted['metadata'].items()},
+            'form_fields': {k: None if v is None else str(v) for k, v in extracted['form_fields'].items()}
+        }
+        
+    except Exception as e:
+        return {'error': str(e)}
+
+def analyze_extractions(doc_paths, extractions):
+    """
+    Analyze the extracted text of a batch of documents with NLP
+    
+    Cached documents are skipped. Each extraction record gets its
+    'extracted_data' or an 'error' added in place.
+    
+    Args:
+        doc_paths (list): Paths to the saved PDF documents
+        extractions (list): Their records from extract_single_document
+    """
+    pending = []
+    for doc_path, extraction in zip(doc_paths, extractions):
+        if 'text' in extraction:
+            document = Document(doc_path)
+            document.set_content(extraction.pop('text'))
+            document.metadata['pdf_metadata'] = extraction['metadata']
+            pending.append((extraction, document))
+    
+    if not pending:
+        return
+        
+    # Analyze the documents as one batch
+    analyzer = get_document_analyzer()
+    documents = [document for _, document in pending]
+    try:
+        analyzed = analyzer.analyze_batch(documents)
+    except Exception as e:
+        logger.error(f"Batch analysis failed, analyzing documents one by one: {str(e)}")
+        analyzed = []
+        for document in documents:
+            try:
+                analyzed.append(analyzer.analyze(document))
+            except Exception as e:
+                analyzed.append(e)
+    
+    for (extraction, _), extracted_data in zip(pending, analyzed):
+        if isinstance(extracted_data, Exception):
+            extraction['error'] = str(extracted_data)
+        else:
+            if extraction['form_fields']:
+                extracted_data['form_fields'] = extraction['form_fields']
+            extraction['extracted_data'] = extracted_data
+            analysis_cache.set(extraction['content_hash'], extracted_data)
+
+def process_documents_iter(doc_paths, doc_filenames, template, result_folder, map_func=map,
+                           batch_size=PROCESS_BATCH_SIZE):
+    """
+    Extract, analyze and render documents, yielding each document's result
+    
+    Documents go through all three steps a batch at a time, so only one
+    batch's text and spaCy Docs are in memory at once, while each batch still
+    gets parallel extraction (with map_func, e.g. a process pool's map) and a
+    single spaCy pipe.
+    
+    Args:
+        doc_paths (list): Paths to the saved PDF documents
+        doc_filenames (list): Sanitized names of the documents
+        template (Template): The loaded template
+        result_folder (str): Folder to write the generated forms to
+        map_func (callable): map implementation used for text extraction
+        batch_size (int): Number of documents to process at a time
+        
+    Yields:
+        dict: 'filename' with 'result_path' and 'extracted_data', or with 'error'
+    """
+    for start in range(0, len(doc_paths), batch_size):
+        batch_paths = doc_paths[start:start + batch_size]
+        batch_filenames = doc_filenames[start:start + batch_size]
+        
+        # Extract text from the batch, then analyze it
+        extractions = list(map_func(extract_single_document, batch_paths))
+        analyze_extractions(batch_paths, extractions)
+        
+        # Generate forms
+        for doc_filename, extraction in zip(batch_filenames, extractions):
+            if 'error' in extraction:
+                yield {'filename': doc_filename, 'error': extraction['error']}
+                continue
+                
+            try:
+                output_filename = os.path.join(result_folder, f"processed_{os.path.splitext(doc_filename)[0]}.docx")
+                get_form_generator().generate(extraction['extracted_data'], template, output_filename)
+                
+                yield {
+                    'filename': doc_filename,
+                    'result_path': output_filename,
+                    'extracted_data': extraction['extracted_data']
+                }
+            except Exception as e:
+                yield {'filename': doc_filename, 'error': str(e)}
+
+def process_documents(doc_paths, doc_filenames, template, result_folder, map_func=map):
+    """
+    Extract, analyze and render a list of documents
+    
+    Args:
+        doc_paths (list): Paths to the saved PDF documents
+        doc_filenames (list): Sanitized names of the documents
+        template (Template): The loaded template
+        result_folder (str): Folder to write the generated forms to
+        map_func (callable): map implementation used for text extraction
+        
+    Returns:
+        tuple: (results of the processed documents, results of the failed ones)
+    """
+    processed_docs = []
+    errors = []
+    
+    for record in process_documents_iter(doc_paths, doc_filenames, template, result_folder, map_func):
+        if 'error' in record:
+            errors.append(record)
+        else:
+            processed_docs.append(record)
+    
+    return processed_docs, errors
+
+def save_summary(job_id, result_folder, processed_docs, errors=None):
+    """
+    Save the extraction result summary for a job
+    
+    The file is written by a background thread; until it appears the job's
+    status reports it as still processing.
+    
+    Args:
+        job_id (str): The job identifier
+        result_folder (str): Folder holding the job's results
+        processed_docs (list): Results of the successfully processed documents
+        errors (list, optional): Results of the documents that failed
+        
+    Returns:
+        dict: The saved summary
+    """
+    summary = {
+        'job_id': job_id,
+        'timestamp': datetime.now().isoformat(),
+        'documents': [doc['filename'] for doc in processed_docs],
+        'results': processed_docs,
+        'errors': errors or []
+    }
+    
+    summary_file = os.path.join(result_folder, 'extraction_summary.json')
+    summary_writer.submit(write_summary, summary, summary_file)
+        
+    return summary
+
+def write_summary(summary, summary_file):
+    """
+    Write a job summary to disk atomically
+    
+    Args:
+        summary (dict): The job summary
+        summary_file (str): Path to write the summary to
+    """
+    tmp_file = f"{summary_file}.tmp"
+    
+    try:
+        json_utils.dump_file(summary, tmp_file)
+        # Rename into place so readers never see a partial summary
+        os.replace(tmp_file, summary_file)
+    except Exception as e:
+        logger.error(f"Error saving summary {summary_file}: {str(e)}")
+
+def run_job(job_id, template_path, doc_paths, doc_filenames):
+    """
+    Process all documents of a job in the current process and save the summary
+    
+    Used by the Celery worker, which parallelizes across jobs itself.
+    
+    Args:
+        job_id (str): The job identifier
+        template_path (str): Path to the saved template file
+        doc_paths (list): Paths to the saved PDF documents
+        doc_filenames (list): Sanitized names of the documents
+        
+    Returns:
+        dict: The saved summary
+    """
+    result_folder = os.path.join(RESULT_FOLDER, job_id)
+    os.makedirs(result_folder, exist_ok=True)
+    
+    # Template files are named after their content hash, so the path is a cache key
+    template = template_cache.get(template_path, lambda: Template(template_path))
+    
+    processed_docs, errors = process_documents(doc_paths, doc_filenames, template, result_folder)
+    
+    return save_summary(job_id, result_folder, processed_docs, errors)
+
+def save_template(data, template_hash, extension):
+    """
+    Save an uploaded template under the hash of its content
+    
+    Only needed when another process (the Celery worker) has to load the
+    template. Identical templates share one file, which is only written the
+    first time.
+    
+    Args:
+        data (bytes): The template file content
+        template_hash (str): SHA-256 hex digest of the content
+        extension (str): The template file extension, e.g. '.docx'
+        
+    Returns:
+        str: Path to the saved template
+    """
+    template_path = os.path.join(TEMP_FOLDER, f"template_{template_hash}{extension}")
+    
+    if not os.path.exists(template_path):
+        tmp_path = f"{template_path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, template_path)
+        
+    return template_path
+
+def save_upload(file_storage, path):
+    """
+    Stream an uploaded file to disk in chunks, without reading it into memory
+    
+    Args:
+        file_storage: The uploaded file (werkzeug FileStorage)
+        path (str): Path to save the file to
+    """
+    with open(path, 'wb') as f:
+        shutil.copyfileobj(file_storage.stream, f, length=UPLOAD_CHUNK_SIZE)
+
+def allowed(filename, allowed_extensions):
+    return os.path.splitext(filename)[1].lower() in allowed_extensions
 
 @app.route('/')
 def index():
@@ -68,82 +471,147 @@ def upload_files():
         flash('No template file selected', 'error')
         return redirect(request.url)
     
-    if not allowed_template_file(template_file.filename):
-        flash(f'Template file must be one of: {", ".join(ALLOWED_TEMPLATE_EXTENSIONS)}', 'error')
+    if not allowed(template_file.filename, ALLOWED_TEMPLATE_EXTENSIONS):
+        flash(f'Template file must be one of: {", ".join(sorted(ALLOWED_TEMPLATE_EXTENSIONS))}', 'error')
         return redirect(request.url)
     
-    # Save template
-    template_filename = secure_filename(template_file.filename)
-    template_path = os.path.join(TEMP_FOLDER, f"{uuid.uuid4()}_{template_filename}")
-    template_file.save(template_path)
-    
-    # Load template
-    template = Template(template_path)
+    # Templates are small, so keep them in memory and identify them by content
+    template_data = template_file.read()
+    template_hash = hashlib.sha256(template_data).hexdigest()
+    template_extension = os.path.splitext(template_file.filename)[1].lower()
     
     # Process each document
-    processed_docs = []
     job_id = str(uuid.uuid4())
     result_folder = os.path.join(RESULT_FOLDER, job_id)
     os.makedirs(result_folder, exist_ok=True)
     
+    doc_paths = []
+    doc_filenames = []
+    
     for document_file in documents:
         if document_file.filename == '':
             continue
             
-        if not allowed_document_file(document_file.filename):
+        if not allowed(document_file.filename, ALLOWED_DOCUMENT_EXTENSIONS):
             flash(f'Document file must be PDF: {document_file.filename}', 'warning')
             continue
             
         try:
             # Save document
             doc_filename = secure_filename(document_file.filename)
-            doc_path = os.path.join(TEMP_FOLDER, f"{uuid.uuid4()}_{doc_filename}")
-            document_file.save(doc_path)
-            
-            # Process document
-            document = Document(doc_path)
-            
-            # Extract text
-            extracted_text = pdf_extractor.extract_text(doc_path)
-            document.set_content(extracted_text)
-            
-            # Analyze with NLP
-            extracted_data = document_analyzer.analyze(document)
-            
-            # Generate form
-            output_filename = os.path.join(result_folder, f"processed_{doc_filename.rsplit('.', 1)[0]}.docx")
-            form_generator.generate(extracted_data, template, output_filename)
+            doc_path = os.path.join(TEMP_FOLDER, f"{uuid.uuid4().hex}_{doc_filename}")
+            save_upload(document_file, doc_path)
             
-            processed_docs.append({
-                'filename': doc_filename,
-                'result_path': output_filename,
-                'extracted_data': extracted_data
-            })
+            doc_paths.append(doc_path)
+            doc_filenames.append(doc_filename)
             
         except Exception as e:
             flash(f'Error processing {doc_filename}: {str(e)}', 'error')
     
+    # Queue the job and return immediately when running with Celery
+    if USE_CELERY:
+        from tasks import process_job
+        template_path = save_template(template_data, template_hash, template_extension)
+        process_job.delay(job_id, template_path, doc_paths, doc_filenames)
+        return render_template('processing.html', job_id=job_id)
+    
+    # Load template, reusing it if the same template was uploaded before
+    template = template_cache.get(
+        template_hash,
+        lambda: Template(io.BytesIO(template_data), filename=template_file.filename)
+    )
+    
+    # Process the saved documents, extracting text in parallel
+    processed_docs, errors = process_documents(
+        doc_paths,
+        doc_filenames,
+        template,
+        result_folder,
+        map_func=get_executor().map
+    )
+    
+    for error in errors:
+        flash(f'Error processing {error["filename"]}: {error["error"]}', 'error')
+    
     # Save extraction result summary
-    summary_file = os.path.join(result_folder, 'extraction_summary.json')
-    with open(summary_file, 'w') as f:
-        json.dump({
-            'job_id': job_id,
-            'timestamp': datetime.now().isoformat(),
-            'documents': [doc['filename'] for doc in processed_docs],
-            'results': processed_docs
-        }, f, indent=4)
+    save_summary(job_id, result_folder, processed_docs, errors)
     
     return render_template('results.html', job_id=job_id, documents=processed_docs)
 
+def job_folder(job_id):
+    """
+    Get the result folder of a job, aborting with 404 for malformed job ids
+    
+    Job ids are UUIDs, so this also keeps ids such as '..' from reaching
+    paths outside the results folder.
+    
+    Args:
+        job_id (str): The job identifier from the URL
+        
+    Returns:
+        str: Path to the job's result folder
+    """
+    try:
+        valid = str(uuid.UUID(job_id)) == job_id
+    except ValueError:
+        valid = False
+    if not valid:
+        abort(404)
+    return os.path.join(RESULT_FOLDER, job_id)
+
+@app.route('/status/<job_id>')
+def job_status(job_id):
+    summary_file = os.path.join(job_folder(job_id), 'extraction_summary.json')
+    if not os.path.exists(summary_file):
+        return jsonify({'job_id': job_id, 'status': 'processing'})
+        
+    summary = json_utils.load_file(summary_file)
+    summary['status'] = 'complete'
+    
+    return jsonify(summary)
+
+@app.route('/results/<job_id>')
+def job_results(job_id):
+    summary_file = os.path.join(job_folder(job_id), 'extraction_summary.json')
+    if not os.path.exists(summary_file):
+        return render_template('processing.html', job_id=job_id)
+        
+    summary = json_utils.load_file(summary_file)
+        
+    for error in summary.get('errors', []):
+        flash(f'Error processing {error["filename"]}: {error["error"]}', 'error')
+    
+    return render_template('results.html', job_id=job_id, documents=summary['results'])
+
 @app.route('/download/<job_id>/<path:filename>')
 def download_file(job_id, filename):
-    result_path = os.path.join(RESULT_FOLDER, job_id, filename)
-    if os.path.exists(result_path):
-        return send_file(result_path, as_attachment=True)
+    result_folder = job_folder(job_id)
+    if os.path.exists(os.path.join(result_folder, filename)):
+        return send_from_directory(result_folder, filename, as_attachment=True)
     else:
         flash('File not found', 'error')
         return redirect(url_for('index'))
 
+@app.route('/download_all/<job_id>')
+def download_all(job_id):
+    result_folder = job_folder(job_id)
+    if not os.path.isdir(result_folder):
+        flash('Job not found', 'error')
+        return redirect(url_for('index'))
+        
+    # Stream the archive as it is built instead of creating it in memory first
+    from zipstream import ZipStream
+    zs = ZipStream.from_path(result_folder)
+    
+    return Response(
+        zs,
+        mimetype='application/zip',
+        headers={
+            'Content-Disposition': f'attachment; filename="{job_id}.zip"',
+            'Content-Length': str(len(zs))
+        }
+    )
+
 @app.route('/templates')
 def template_management():
     return render_template('templates.html')
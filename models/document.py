@@ -1,7 +1,9 @@
 import os
-import json
+import time
 from datetime import datetime
 
+from utils import json_utils
+
 class Document:
     """
     Represents a legal document with its content and metadata.
@@ -16,9 +18,13 @@ class Document:
         """
         self.file_path = file_path
         self.filename = os.path.basename(file_path) if file_path else None
+        self.extension = os.path.splitext(file_path)[1].lower() if file_path else None
         self.content = None
+        # Text of each page, when the extractor provides it separately
+        self.pages = None
         self.metadata = {
-            "created_at": datetime.now().isoformat(),
+            # Timestamps are kept as epoch seconds and formatted in to_dict
+            "created_at": time.time(),
             "file_path": file_path,
             "filename": self.filename,
             "document_type": None,
@@ -26,16 +32,18 @@ class Document:
         }
         self.extracted_data = {}
         
-    def set_content(self, content):
+    def set_content(self, content, pages=None):
         """
         Set the text content of the document
         
         Args:
             content (str): The extracted text content
+            pages (list, optional): The text of each page, without page markers
         """
         self.content = content
+        self.pages = pages
         self.metadata["processed"] = True
-        self.metadata["processed_at"] = datetime.now().isoformat()
+        self.metadata["processed_at"] = time.time()
         
     def set_document_type(self, doc_type):
         """
@@ -81,8 +89,13 @@ class Document:
         Returns:
             dict: Dictionary representation of the document
         """
+        metadata = dict(self.metadata)
+        for key in ("created_at", "processed_at"):
+            if isinstance(metadata.get(key), float):
+                metadata[key] = datetime.fromtimestamp(metadata[key]).isoformat()
+                
         return {
-            "metadata": self.metadata,
+            "metadata": metadata,
             "extracted_data": self.extracted_data
         }
         
@@ -93,7 +106,7 @@ class Document:
         Returns:
             str: JSON string representation of the document
         """
-        return json.dumps(self.to_dict(), indent=4)
+        return json_utils.dumps(self.to_dict()).decode('utf-8')
         
     def save_extraction_results(self, output_path):
         """
@@ -116,8 +129,7 @@ class Document:
         Returns:
             Document: A new Document instance
         """
-        with open(json_path, 'r') as f:
-            data = json.load(f)
+        data = json_utils.load_file(json_path)
             
         doc = cls(data.get("metadata", {}).get("file_path"))
         doc.metadata = data.get("metadata", {})
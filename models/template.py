@@ -1,33 +1,51 @@
+import io
+import logging
 import os
-import json
+import time
 from datetime import datetime
-from docxtpl import DocxTemplate
+
+from utils import json_utils
+
+logger = logging.getLogger(__name__)
 
 class Template:
     """
     Represents a template for generating documents from extracted data.
     """
     
-    def __init__(self, file_path=None):
+    def __init__(self, file_path=None, filename=None):
         """
         Initialize a template object
         
         Args:
-            file_path (str, optional): Path to the template file (DOCX or JSON)
-        """
+            file_path (str or file-like, optional): Path to the template file
+                                                    (DOCX or JSON), or a file-like
+                                                    object to read it from
+            filename (str, optional): Name of the template file, needed to
+                                      tell its type when reading from a file-like object
+        """
+        # Templates read from a file-like object are kept in memory
+        self.data = None
+        if file_path is not None and not isinstance(file_path, str):
+            self.data = file_path.read()
+            file_path = None
+            
         self.file_path = file_path
-        self.filename = os.path.basename(file_path) if file_path else None
-        self.extension = os.path.splitext(file_path)[1].lower() if file_path else None
+        name = filename or file_path
+        self.filename = os.path.basename(name) if name else None
+        self.extension = os.path.splitext(name)[1].lower() if name else None
         self.template_type = 'docx' if self.extension == '.docx' else 'json'
         self.fields = []
+        self._field_set = None
         self.metadata = {
-            "created_at": datetime.now().isoformat(),
+            # Kept as epoch seconds and formatted in to_dict
+            "created_at": time.time(),
             "file_path": file_path,
             "filename": self.filename,
             "template_type": self.template_type
         }
         
-        if file_path and os.path.exists(file_path):
+        if self.data is not None or (file_path and os.path.exists(file_path)):
             self._load_template()
     
     def _load_template(self):
@@ -39,52 +57,49 @@ class Template:
         elif self.template_type == 'json':
             self._load_json_template()
     
+    def open_source(self):
+        """
+        Get something to read the template file from
+        
+        Returns:
+            The template's path, or a fresh file-like object for in-memory templates
+        """
+        if self.data is not None:
+            return io.BytesIO(self.data)
+        return self.file_path
+    
     def _load_docx_template(self):
         """
         Load a DOCX template and extract its fields
         """
         try:
-            self.docx_template = DocxTemplate(self.file_path)
-            # Extract variables from the template
-            # This is a simplified approach - in a real system, you might need
-            # to parse the XML of the DOCX to find all variables
+            from docxtpl import DocxTemplate
+            
+            self.docx_template = DocxTemplate(self.open_source())
+            # Parse the variables out of the template XML once, at load time
             self.fields = self._extract_docx_fields()
         except Exception as e:
-            print(f"Error loading DOCX template: {str(e)}")
+            logger.error(f"Error loading DOCX template: {str(e)}")
             self.docx_template = None
     
     def _extract_docx_fields(self):
         """
-        Attempt to extract fields from a DOCX template
+        Extract the fields used by the loaded DOCX template
         
         Returns:
-            list: List of field names
+            list: Sorted list of the template's undeclared Jinja2 variable names
         """
-        # This is a simplified implementation
-        # In a real system, you would parse the DOCX XML to find all Jinja2 variables
-        # For now, we'll return a default set of fields for real estate documents
-        return [
-            "property_address",
-            "property_description",
-            "transaction_date",
-            "transaction_amount",
-            "buyer_name",
-            "seller_name",
-            "lender_name",
-            "loan_amount",
-            "interest_rate",
-            "term_years",
-            "monthly_payment",
-            "closing_date"
-        ]
+        return sorted(self.docx_template.get_undeclared_template_variables())
     
     def _load_json_template(self):
         """
         Load a JSON template
         """
         try:
-            with open(self.file_path, 'r') as f:
-                template_data = json.load(f)
+            if self.data is not None:
+                template_data = json_utils.loads(self.data)
+            else:
+                template_data = json_utils.load_file(self.file_path)
             
             self.json_template = template_data
             self.fields = template_data.get('fields', [])
@@ -98,7 +113,7 @@ class Template:
             })
             
         except Exception as e:
-            print(f"Error loading JSON template: {str(e)}")
+            logger.error(f"Error loading JSON template: {str(e)}")
             self.json_template = None
     
     def get_fields(self):
@@ -110,6 +125,24 @@ class Template:
         """
         return self.fields
     
+    def __getstate__(self):
+        # The parsed DOCX isn't picklable; the file content or path is enough
+        # to render the template in another process
+        state = self.__dict__.copy()
+        state.pop('docx_template', None)
+        return state
+    
+    def get_field_set(self):
+        """
+        Get the fields in the template as a set, built on first use
+        
+        Returns:
+            frozenset: Set of field names
+        """
+        if self._field_set is None:
+            self._field_set = frozenset(self.fields)
+        return self._field_set
+    
     def get_field_schema(self):
         """
         Get the schema of fields with their expected types
@@ -140,10 +173,10 @@ class Template:
             elif self.template_type == 'json' and hasattr(self, 'json_template'):
                 # For JSON templates, we would implement custom document generation logic
                 # This would depend on the specific format of your JSON template
-                print("JSON template rendering not fully implemented")
+                logger.warning("JSON template rendering not fully implemented")
                 return False
         except Exception as e:
-            print(f"Error creating document from template: {str(e)}")
+            logger.error(f"Error creating document from template: {str(e)}")
             return False
             
         return False
@@ -155,8 +188,12 @@ class Template:
         Returns:
             dict: Dictionary representation of the template
         """
+        metadata = dict(self.metadata)
+        if isinstance(metadata.get("created_at"), float):
+            metadata["created_at"] = datetime.fromtimestamp(metadata["created_at"]).isoformat()
+            
         return {
-            "metadata": self.metadata,
+            "metadata": metadata,
             "fields": self.fields
         }
         
@@ -167,7 +204,7 @@ class Template:
         Returns:
             str: JSON string representation of the template
         """
-        return json.dumps(self.to_dict(), indent=4)
+        return json_utils.dumps(self.to_dict()).decode('utf-8')
         
     @classmethod
     def from_json(cls, json_path):
@@ -180,8 +217,7 @@ class Template:
         Returns:
             Template: A new Template instance
         """
-        with open(json_path, 'r') as f:
-            data = json.load(f)
+        data = json_utils.load_file(json_path)
             
         template = cls(data.get("metadata", {}).get("file_path"))
         template.metadata = data.get("metadata", {})
@@ -1,126 +1,526 @@
+import io
+import logging
 import os
 import re
-import PyPDF2
-import pdfplumber
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 from tqdm import tqdm
 
+logger = logging.getLogger(__name__)
+
+# pdfminer (used by pdfplumber) logs every token at DEBUG level, which slows
+# extraction down dramatically if the root logger is verbose
+logging.getLogger("pdfminer").setLevel(logging.WARNING)
+logging.getLogger("pdfplumber").setLevel(logging.WARNING)
+
+class OpenPDF:
+    """
+    A PDF file opened once and shared between extraction calls
+    
+    The PyMuPDF, pdfplumber and PyPDF2 documents are opened the first time
+    they are needed and closed together when the handle is closed.
+    """
+    
+    def __init__(self, pdf_path):
+        """
+        Initialize the handle
+        
+        Args:
+            pdf_path (str): Path to the PDF file
+        """
+        # Fail fast on files that aren't PDFs before any parser gets to them.
+        # The header may follow up to 1KB of junk, which readers tolerate.
+        try:
+            with open(pdf_path, 'rb') as f:
+                head = f.read(1024)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"PDF file not found: {pdf_path}")
+            
+        if b'%PDF-' not in head:
+            raise ValueError(f"Not a PDF file: {pdf_path}")
+            
+        self.path = pdf_path
+        self._fitz = None
+        self._plumber = None
+        self._file = None
+        self._reader = None
+    
+    @property
+    def fitz(self):
+        """PyMuPDF document, opened on first access"""
+        if self._fitz is None:
+            import fitz
+            self._fitz = fitz.open(self.path)
+        return self._fitz
+    
+    @property
+    def plumber(self):
+        """pdfplumber document, opened on first access"""
+        if self._plumber is None:
+            import pdfplumber
+            self._plumber = pdfplumber.open(self.path)
+        return self._plumber
+    
+    @property
+    def reader(self):
+        """PyPDF2 reader, opened on first access"""
+        if self._reader is None:
+            import PyPDF2
+            self._file = open(self.path, 'rb')
+            self._reader = PyPDF2.PdfReader(self._file)
+        return self._reader
+    
+    def close(self):
+        """Close whichever underlying documents were opened"""
+        if self._fitz is not None:
+            self._fitz.close()
+            self._fitz = None
+        if self._plumber is not None:
+            self._plumber.close()
+            self._plumber = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._reader = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
 class PDFExtractor:
     """
     Class for extracting text and data from PDF documents
+    
+    The PDF libraries are imported by the methods that use them, so only the
+    selected backends are ever loaded. The pdfminer and pdfplumber loggers
+    are capped at WARNING when this module is imported, since their per-token
+    debug logging makes pdfplumber extraction orders of magnitude slower.
     """
     
-    def __init__(self, ocr_enabled=False):
+    # Text extraction backends, in default fallback order
+    BACKENDS = ('pymupdf', 'pypdfium2', 'pdfplumber', 'pypdf2')
+    
+    # Text extraction modes
+    MODES = ('text-only', 'layout')
+    
+    # Pages with larger content streams are left to the C-based backends,
+    # since pdfplumber parses every graphics operator in Python
+    MAX_PDFPLUMBER_STREAM_SIZE = 20 * 1024 * 1024
+    
+    # Documents with more pages than this are split across worker processes
+    # by extract_text_parallel
+    PARALLEL_MIN_PAGES = 8
+    
+    def __init__(self, ocr_enabled=False, backend='pymupdf', mode='text-only'):
         """
         Initialize the PDF Extractor
         
         Args:
             ocr_enabled (bool): Whether to use OCR for text extraction
+            backend (str): Preferred text extraction backend, one of
+                           'pymupdf', 'pypdfium2', 'pdfplumber' or 'pypdf2'
+            mode (str): 'text-only' or 'layout' (see extract_text)
         """
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Unsupported PDF backend: {backend}")
+        if mode not in self.MODES:
+            raise ValueError(f"Unsupported extraction mode: {mode}")
+            
         self.ocr_enabled = ocr_enabled
+        self.backend = backend
+        self.mode = mode
+    
+    def _resolve_pages(self, pages, total_pages):
+        """
+        Resolve the requested page numbers against the document's page count
+        
+        Args:
+            pages (list, optional): List of page numbers (0-indexed), None for all
+            total_pages (int): Number of pages in the document
+            
+        Returns:
+            Sequence of 0-indexed page numbers
+        """
+        # If pages is None, extract all pages
+        if pages is None:
+            return range(total_pages)
+            
+        # Wrap out-of-range page numbers around the page count
+        return [p % total_pages for p in pages]
+    
+    def _progress(self, pages, desc):
+        """
+        Wrap pages in a progress bar, but only when it would actually be seen
+        
+        Args:
+            pages: Sequence of page numbers
+            desc (str): Progress bar description
+            
+        Returns:
+            Iterable over the page numbers
+        """
+        if len(pages) > 1 and sys.stderr.isatty():
+            return tqdm(pages, desc=desc)
+        return pages
+    
+    def _backend_order(self):
+        """
+        Get the text extraction backends to try, preferred backend first
+        
+        Returns:
+            list: Backend names
+        """
+        return [self.backend] + [b for b in self.BACKENDS if b != self.backend]
+    
+    def open(self, pdf_path):
+        """
+        Open a PDF so several extraction methods can share it
+        
+        Every extract_* method accepts the returned handle in place of a path.
+        
+        Args:
+            pdf_path (str): Path to the PDF file
+            
+        Returns:
+            OpenPDF: Handle to use as a context manager
+        """
+        return OpenPDF(pdf_path)
+    
+    @contextmanager
+    def _opened(self, pdf):
+        """
+        Use an already open handle, or open (and later close) a path
+        
+        Args:
+            pdf: Path to the PDF file or an OpenPDF handle
+            
+        Yields:
+            OpenPDF: The open handle
+        """
+        if isinstance(pdf, OpenPDF):
+            yield pdf
+        else:
+            with OpenPDF(pdf) as opened:
+                yield opened
+    
+    def extract_all(self, pdf_path, include_tables=False):
+        """
+        Extract text, metadata and form fields, opening the PDF only once
+        
+        Args:
+            pdf_path (str): Path to the PDF file
+            include_tables (bool): Whether to also extract tables
+            
+        Returns:
+            dict: 'text', 'metadata' and 'form_fields', plus 'tables' if requested
+        """
+        with self.open(pdf_path) as pdf:
+            result = {
+                'text': self.extract_text(pdf),
+                'metadata': self.extract_metadata(pdf),
+                'form_fields': self.extract_form_fields(pdf)
+            }
+            if include_tables:
+                result['tables'] = self.extract_tables(pdf)
+                
+        return result
     
     def extract_text(self, pdf_path, pages=None):
         """
         Extract all text from a PDF file
         
+        In 'text-only' mode (the default) only the text is wanted, so the
+        pymupdf and pypdfium2 backends are preferable: their parsers only decode
+        text operators, while pdfplumber builds an object for every path, fill
+        and character on the page, which dominates the cost on graphics-heavy
+        pages such as scanned exhibits. 'layout' mode asks pdfplumber to keep
+        the page's physical layout, which is slower but preserves columns.
+        
         Args:
-            pdf_path (str): Path to the PDF file
+            pdf_path: Path to the PDF file or an OpenPDF handle
             pages (list, optional): List of page numbers to extract (0-indexed)
             
         Returns:
             str: The extracted text
         """
-        if not os.path.exists(pdf_path):
-            raise FileNotFoundError(f"PDF file not found: {pdf_path}")
+        with self._opened(pdf_path) as pdf:
+            # Try the preferred backend first, then fall back to the others in order
+            for backend in self._backend_order():
+                try:
+                    return self._extract_text_with(backend, pdf, pages)
+                except Exception as e:
+                    logger.error(f"{backend} extraction failed: {str(e)}")
+                    
+        return ""
+    
+    def _extract_text_with(self, backend, pdf, pages=None):
+        """
+        Extract text from a PDF with one backend, without falling back to the others
+        
+        Args:
+            backend (str): Text extraction backend
+            pdf (OpenPDF): The open PDF
+            pages (list, optional): List of page numbers to extract (0-indexed)
             
-        # Try extraction with pdfplumber first (better formatting)
-        try:
-            return self._extract_with_pdfplumber(pdf_path, pages)
-        except Exception as e:
-            print(f"pdfplumber extraction failed: {str(e)}")
-            print("Falling back to PyPDF2...")
+        Returns:
+            str: The extracted text, as extract_text returns it
+        """
+        buf = io.StringIO()
+        for n, (i, page_text) in enumerate(getattr(self, f"_extract_with_{backend}")(pdf, pages)):
+            if n:
+                buf.write("\n\n")
+            buf.write(f"--- Page {i+1} ---\n")
+            buf.write(page_text)
+        return buf.getvalue()
+    
+    def _working_backend(self, pdf):
+        """
+        Find the first backend, in fallback order, that can extract the first page
+        
+        Args:
+            pdf (OpenPDF): The open PDF
             
-            # Fallback to PyPDF2
+        Returns:
+            str: Backend name, or None if none of them can
+        """
+        for backend in self._backend_order():
             try:
-                return self._extract_with_pypdf2(pdf_path, pages)
+                self._extract_text_with(backend, pdf, [0])
+                return backend
             except Exception as e:
-                print(f"PyPDF2 extraction failed: {str(e)}")
-                return ""
+                logger.error(f"{backend} extraction failed: {str(e)}")
+        return None
     
-    def _extract_with_pdfplumber(self, pdf_path, pages=None):
+    def extract_text_parallel(self, pdf_path, workers=None):
         """
-        Extract text using pdfplumber
+        Extract all text from a PDF file, splitting the pages across worker processes
+        
+        Each worker opens the PDF itself and extracts a contiguous range of
+        pages with the same backend, chosen here so every range is extracted
+        alike. If a range fails, the whole document is extracted in this
+        process instead. Short documents are always extracted in this
+        process, since starting the workers would cost more than it saves.
         
         Args:
-            pdf_path (str): Path to the PDF file
-            pages (list, optional): List of page numbers to extract
+            pdf_path: Path to the PDF file or an OpenPDF handle
+            workers (int, optional): Number of worker processes (defaults to the CPU count)
             
         Returns:
-            str: The extracted text
+            str: The extracted text, as extract_text returns it
         """
-        text = []
+        with self._opened(pdf_path) as pdf:
+            total_pages = self._page_count(pdf)
+            workers = min(workers or os.cpu_count() or 1, total_pages)
+            if workers <= 1 or total_pages <= self.PARALLEL_MIN_PAGES:
+                return self.extract_text(pdf)
+            backend = self._working_backend(pdf)
+            if backend is None:
+                return self.extract_text(pdf)
+            path = pdf.path
         
-        with pdfplumber.open(pdf_path) as pdf:
-            # If pages is None, extract all pages
-            if pages is None:
-                pages = range(len(pdf.pages))
-                
-            # Convert page numbers to 0-indexed if needed
-            pages = [p if p < len(pdf.pages) else p % len(pdf.pages) for p in pages]
+        size = -(-total_pages // workers)
+        ranges = [range(start, min(start + size, total_pages)) for start in range(0, total_pages, size)]
+        
+        try:
+            with ProcessPoolExecutor(max_workers=len(ranges)) as executor:
+                texts = list(executor.map(
+                    _extract_text_range,
+                    [(self.ocr_enabled, backend, self.mode, path, pages) for pages in ranges]
+                ))
+        except Exception as e:
+            logger.error(f"Parallel extraction failed, extracting serially: {str(e)}")
+            return self.extract_text(path)
+        
+        # The ranges are in page order, so joining them gives the same
+        # text as extracting the whole document at once
+        return "\n\n".join(texts)
+    
+    def _page_count(self, pdf):
+        """
+        Get the number of pages in a PDF
+        
+        Args:
+            pdf (OpenPDF): The open PDF
             
-            # Extract text from each page
-            for i in tqdm(pages, desc="Extracting text"):
+        Returns:
+            int: Number of pages
+        """
+        try:
+            return pdf.fitz.page_count
+        except Exception:
+            return len(pdf.reader.pages)
+    
+    def extract_text_iter(self, pdf_path, pages=None):
+        """
+        Extract text from a PDF file one page at a time
+        
+        Unlike extract_text, the full text is never held in memory. Another
+        backend is only tried if the preferred one fails before yielding a page.
+        
+        Args:
+            pdf_path: Path to the PDF file or an OpenPDF handle
+            pages (list, optional): List of page numbers to extract (0-indexed)
+            
+        Yields:
+            str: The text of each page, starting with its page marker
+        """
+        with self._opened(pdf_path) as pdf:
+            for backend in self._backend_order():
+                started = False
                 try:
-                    page = pdf.pages[i]
-                    page_text = page.extract_text() or ""
-                    text.append(f"--- Page {i+1} ---\n{page_text}")
+                    for i, page_text in getattr(self, f"_extract_with_{backend}")(pdf, pages):
+                        started = True
+                        yield f"--- Page {i+1} ---\n{page_text}"
+                    return
                 except Exception as e:
-                    print(f"Error extracting text from page {i+1}: {str(e)}")
-                    text.append(f"--- Page {i+1} ---\n[Error: Could not extract text]")
+                    if started:
+                        raise
+                    logger.error(f"{backend} extraction failed: {str(e)}")
+    
+    def _extract_with_pymupdf(self, pdf, pages=None):
+        """
+        Extract text using PyMuPDF (fitz)
+        
+        Args:
+            pdf (OpenPDF): The open PDF
+            pages (list, optional): List of page numbers to extract
+            
+        Yields:
+            tuple: (page index, page text) for each page
+        """
+        doc = pdf.fitz
+        total_pages = doc.page_count
         
-        return "\n\n".join(text)
+        pages = self._resolve_pages(pages, total_pages)
+        
+        # Extract text from each page
+        for i in self._progress(pages, "Extracting text"):
+            try:
+                page_text = doc.load_page(i).get_text("text") or ""
+            except Exception as e:
+                logger.error(f"Error extracting text from page {i+1}: {str(e)}")
+                page_text = "[Error: Could not extract text]"
+            yield i, page_text
     
-    def _extract_with_pypdf2(self, pdf_path, pages=None):
+    def _extract_with_pypdfium2(self, pdf, pages=None):
         """
-        Extract text using PyPDF2
+        Extract text using pypdfium2 (PDFium bindings)
         
         Args:
-            pdf_path (str): Path to the PDF file
+            pdf (OpenPDF): The open PDF
             pages (list, optional): List of page numbers to extract
             
-        Returns:
-            str: The extracted text
+        Yields:
+            tuple: (page index, page text) for each page
         """
-        text = []
+        import pypdfium2 as pdfium
         
-        with open(pdf_path, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            total_pages = len(pdf_reader.pages)
+        doc = pdfium.PdfDocument(pdf.path)
+        try:
+            total_pages = len(doc)
             
-            # If pages is None, extract all pages
-            if pages is None:
-                pages = range(total_pages)
-                
-            # Convert page numbers to 0-indexed if needed
-            pages = [p if p < total_pages else p % total_pages for p in pages]
+            pages = self._resolve_pages(pages, total_pages)
             
             # Extract text from each page
-            for i in tqdm(pages, desc="Extracting text"):
+            for i in self._progress(pages, "Extracting text"):
                 try:
-                    page = pdf_reader.pages[i]
-                    page_text = page.extract_text() or ""
-                    text.append(f"--- Page {i+1} ---\n{page_text}")
+                    page = doc[i]
+                    textpage = page.get_textpage()
+                    page_text = textpage.get_text_range() or ""
+                    textpage.close()
+                    page.close()
                 except Exception as e:
-                    print(f"Error extracting text from page {i+1}: {str(e)}")
-                    text.append(f"--- Page {i+1} ---\n[Error: Could not extract text]")
+                    logger.error(f"Error extracting text from page {i+1}: {str(e)}")
+                    page_text = "[Error: Could not extract text]"
+                yield i, page_text
+        finally:
+            doc.close()
+    
+    def _extract_with_pdfplumber(self, pdf, pages=None):
+        """
+        Extract text using pdfplumber
+        
+        Args:
+            pdf (OpenPDF): The open PDF
+            pages (list, optional): List of page numbers to extract
+            
+        Yields:
+            tuple: (page index, page text) for each page
+        """
+        plumber = pdf.plumber
+        pages = self._resolve_pages(pages, len(plumber.pages))
+        
+        # Extract text from each page
+        for i in self._progress(pages, "Extracting text"):
+            if self._content_stream_size(plumber.pages[i]) > self.MAX_PDFPLUMBER_STREAM_SIZE:
+                raise ValueError(f"Page {i+1} content stream is too large for pdfplumber")
+                
+            try:
+                page = plumber.pages[i]
+                if self.mode == 'layout':
+                    page_text = page.extract_text(layout=True) or ""
+                else:
+                    page_text = page.extract_text(x_tolerance=2, y_tolerance=2) or ""
+            except Exception as e:
+                logger.error(f"Error extracting text from page {i+1}: {str(e)}")
+                page_text = "[Error: Could not extract text]"
+            yield i, page_text
+    
+    def _content_stream_size(self, page):
+        """
+        Get the declared size of a pdfplumber page's content streams
+        
+        Args:
+            page: pdfplumber page
+            
+        Returns:
+            int: Total stream length in bytes, 0 if it can't be determined
+        """
+        from pdfminer.pdftypes import resolve1
+        
+        try:
+            size = 0
+            for stream in page.page_obj.contents:
+                size += resolve1(resolve1(stream).attrs.get('Length', 0)) or 0
+            return size
+        except Exception:
+            return 0
+    
+    def _extract_with_pypdf2(self, pdf, pages=None):
+        """
+        Extract text using PyPDF2
         
-        return "\n\n".join(text)
+        Args:
+            pdf (OpenPDF): The open PDF
+            pages (list, optional): List of page numbers to extract
+            
+        Yields:
+            tuple: (page index, page text) for each page
+        """
+        pdf_reader = pdf.reader
+        total_pages = len(pdf_reader.pages)
+        
+        pages = self._resolve_pages(pages, total_pages)
+        
+        # Extract text from each page
+        for i in self._progress(pages, "Extracting text"):
+            try:
+                page = pdf_reader.pages[i]
+                page_text = page.extract_text() or ""
+            except Exception as e:
+                logger.error(f"Error extracting text from page {i+1}: {str(e)}")
+                page_text = "[Error: Could not extract text]"
+            yield i, page_text
     
     def extract_tables(self, pdf_path, pages=None):
         """
         Extract tables from PDF
         
         Args:
-            pdf_path (str): Path to the PDF file
+            pdf_path: Path to the PDF file or an OpenPDF handle
             pages (list, optional): List of page numbers to extract tables from
             
         Returns:
@@ -129,25 +529,20 @@ class PDFExtractor:
         tables_by_page = {}
         
         try:
-            with pdfplumber.open(pdf_path) as pdf:
-                # If pages is None, extract all pages
-                if pages is None:
-                    pages = range(len(pdf.pages))
-                    
-                # Convert page numbers to 0-indexed if needed
-                pages = [p if p < len(pdf.pages) else p % len(pdf.pages) for p in pages]
+            with self._opened(pdf_path) as pdf:
+                pages = self._resolve_pages(pages, len(pdf.plumber.pages))
                 
                 # Extract tables from each page
-                for i in tqdm(pages, desc="Extracting tables"):
+                for i in self._progress(pages, "Extracting tables"):
                     try:
-                        page = pdf.pages[i]
+                        page = pdf.plumber.pages[i]
                         tables = page.extract_tables()
                         if tables:
                             tables_by_page[i+1] = tables
                     except Exception as e:
-                        print(f"Error extracting tables from page {i+1}: {str(e)}")
+                        logger.error(f"Error extracting tables from page {i+1}: {str(e)}")
         except Exception as e:
-            print(f"Error extracting tables: {str(e)}")
+            logger.error(f"Error extracting tables: {str(e)}")
             
         return tables_by_page
     
@@ -156,7 +551,7 @@ class PDFExtractor:
         Extract form fields from a PDF
         
         Args:
-            pdf_path (str): Path to the PDF file
+            pdf_path: Path to the PDF file or an OpenPDF handle
             
         Returns:
             dict: Dictionary of form fields and their values
@@ -164,14 +559,14 @@ class PDFExtractor:
         form_fields = {}
         
         try:
-            with open(pdf_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
+            with self._opened(pdf_path) as pdf:
+                pdf_reader = pdf.reader
                 
                 if pdf_reader.is_encrypted:
                     try:
                         pdf_reader.decrypt('')  # Try empty password
                     except:
-                        print("PDF is encrypted and could not be decrypted")
+                        logger.error("PDF is encrypted and could not be decrypted")
                         return form_fields
                 
                 if '/AcroForm' in pdf_reader.trailer['/Root']:
@@ -189,10 +584,10 @@ class PDFExtractor:
                                 else:
                                     form_fields[field_name] = None
                     except Exception as e:
-                        print(f"Error extracting form fields: {str(e)}")
+                        logger.error(f"Error extracting form fields: {str(e)}")
                         
         except Exception as e:
-            print(f"Error processing PDF for form fields: {str(e)}")
+            logger.error(f"Error processing PDF for form fields: {str(e)}")
             
         return form_fields
     
@@ -201,7 +596,7 @@ class PDFExtractor:
         Extract metadata from a PDF
         
         Args:
-            pdf_path (str): Path to the PDF file
+            pdf_path: Path to the PDF file or an OpenPDF handle
             
         Returns:
             dict: Dictionary of metadata
@@ -209,8 +604,8 @@ class PDFExtractor:
         metadata = {}
         
         try:
-            with open(pdf_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
+            with self._opened(pdf_path) as pdf:
+                pdf_reader = pdf.reader
                 
                 if pdf_reader.metadata:
                     # Map common metadata fields
@@ -238,7 +633,7 @@ class PDFExtractor:
                 metadata['page_count'] = len(pdf_reader.pages)
                 
         except Exception as e:
-            print(f"Error extracting metadata: {str(e)}")
+            logger.error(f"Error extracting metadata: {str(e)}")
             
         return metadata
     
@@ -247,7 +642,7 @@ class PDFExtractor:
         Extract text from specific regions of the PDF
         
         Args:
-            pdf_path (str): Path to the PDF file
+            pdf_path: Path to the PDF file or an OpenPDF handle
             regions (dict): Dictionary mapping page numbers to lists of region bounding boxes
                             (x0, top, x1, bottom)
         
@@ -257,7 +652,8 @@ class PDFExtractor:
         region_text = {}
         
         try:
-            with pdfplumber.open(pdf_path) as pdf:
+            with self._opened(pdf_path) as opened:
+                pdf = opened.plumber
                 for page_num, page_regions in regions.items():
                     # Adjust for 0-indexed pages
                     page_idx = page_num - 1
@@ -274,9 +670,28 @@ class PDFExtractor:
                             text = region.extract_text() or ""
                             region_text[region_id] = text
                         except Exception as e:
-                            print(f"Error extracting region {region_id} from page {page_num}: {str(e)}")
+                            logger.error(f"Error extracting region {region_id} from page {page_num}: {str(e)}")
                             region_text[region_id] = ""
         except Exception as e:
-            print(f"Error in region extraction: {str(e)}")
+            logger.error(f"Error in region extraction: {str(e)}")
             
-        return region_text 
\ No newline at end of file
+        return region_text 
+
+def _extract_text_range(args):
+    """
+    Extract the text of a range of pages in a worker process (see extract_text_parallel)
+    
+    Only the given backend is used, and errors are raised to the parent
+    instead of falling back to another backend.
+    
+    Args:
+        args (tuple): The extractor's ocr_enabled and mode settings, the backend
+                      to use, the PDF path and the page numbers to extract
+        
+    Returns:
+        str: The extracted text
+    """
+    ocr_enabled, backend, mode, pdf_path, pages = args
+    extractor = PDFExtractor(ocr_enabled, backend, mode)
+    with extractor.open(pdf_path) as pdf:
+        return extractor._extract_text_with(backend, pdf, pages)
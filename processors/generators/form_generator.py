@@ -1,15 +1,205 @@
+import io
+import logging
 import os
-import json
-from docxtpl import DocxTemplate
-import pandas as pd
-import openpyxl
+import re
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 
+from utils import json_utils
+from utils.normalize import parse_amount
+
+logger = logging.getLogger(__name__)
+
+# Default values for missing fields, shared by every render
+EMPTY_DEFAULT = ""
+ZERO_AMOUNT_DEFAULT = "$0.00"
+ZERO_RATE_DEFAULT = "0%"
+
+# Matches runs of non-numeric characters in phone numbers
+NON_DIGIT_RE = re.compile(r'\D+')
+
+# Field formatters. Each builder resolves a field's format options once and
+# returns a function that formats a value, or returns it as is if it can't.
+# The DOCX, Excel and date parsing libraries are imported where they're first
+# used, so workflows that don't need them never load them.
+
+def _date_formatter(format_info):
+    from dateutil.parser import parse as parse_date
+    
+    date_format = format_info.get('format', '%Y-%m-%d')
+    
+    def format_date(value):
+        try:
+            # This is simplified - would need more robust date parsing
+            return parse_date(str(value)).strftime(date_format)
+        except (ValueError, OverflowError):
+            return value
+    return format_date
+
+def _currency_formatter(format_info):
+    currency_symbol = format_info.get('symbol', '$')
+    
+    def format_currency(value):
+        if type(value) in (int, float):
+            amount = value
+        else:
+            amount = parse_amount(str(value))
+            if amount is None:
+                return value
+        return f"{currency_symbol}{amount:,.2f}"
+    return format_currency
+
+def _number_formatter(format_info):
+    decimal_places = format_info.get('decimal_places', 2)
+    
+    def format_number(value):
+        if type(value) in (int, float):
+            num = value
+        else:
+            try:
+                num = float(str(value).replace(',', ''))
+            except ValueError:
+                return value
+        return f"{num:,.{decimal_places}f}"
+    return format_number
+
+def _percentage_formatter(format_info):
+    decimal_places = format_info.get('decimal_places', 2)
+    
+    def format_percentage(value):
+        if type(value) in (int, float):
+            pct = value
+        else:
+            value_str = str(value)
+            if value_str.endswith('%'):
+                value_str = value_str[:-1]
+            try:
+                pct = float(value_str)
+            except ValueError:
+                return value
+        return f"{pct:.{decimal_places}f}%"
+    return format_percentage
+
+def _phone_formatter(format_info):
+    def format_phone(value):
+        # Format as phone number (US format), removing non-numeric characters
+        phone = NON_DIGIT_RE.sub('', str(value))
+        if len(phone) == 10:
+            return f"({phone[0:3]}) {phone[3:6]}-{phone[6:]}"
+        return value
+    return format_phone
+
+def _boolean_formatter(format_info):
+    def format_boolean(value):
+        # Format as Yes/No
+        if isinstance(value, str):
+            return "Yes" if value.lower() in ['true', 'yes', 'y', '1'] else "No"
+        return "Yes" if value else "No"
+    return format_boolean
+
+FORMATTERS = {
+    'date': _date_formatter,
+    'currency': _currency_formatter,
+    'number': _number_formatter,
+    'percentage': _percentage_formatter,
+    'phone': _phone_formatter,
+    'boolean': _boolean_formatter
+}
+
+@lru_cache(maxsize=1)
+def _generation_stamp(second):
+    """
+    Format the generation date and time, once per second
+    
+    Args:
+        second (int): Current time in whole epoch seconds
+        
+    Returns:
+        tuple: (date string, time string)
+    """
+    now = datetime.fromtimestamp(second)
+    return now.strftime('%Y-%m-%d'), now.strftime('%H:%M:%S')
+
+@lru_cache(maxsize=32)
+def _key_prefixes(fields, sep):
+    """
+    Get every flattened key prefix that can lead to one of the given fields
+    
+    Field names may contain the separator themselves, so every split point
+    is treated as a possible nesting level.
+    
+    Args:
+        fields (frozenset): Flattened field names
+        sep (str): Separator for nested keys
+        
+    Returns:
+        frozenset: The proper prefixes of the field names
+    """
+    prefixes = set()
+    for field in fields:
+        parts = field.split(sep)
+        for i in range(1, len(parts)):
+            prefixes.add(sep.join(parts[:i]))
+    return frozenset(prefixes)
+
+def _create_jinja_env(max_compiled=64):
+    """
+    Create a Jinja environment that reuses compiled templates
+    
+    docxtpl compiles each XML part of a DOCX (body, headers, footers) with
+    from_string on every render. The parts of a given template are the same
+    every time, so the compiled templates are kept, keyed by their source.
+    
+    Args:
+        max_compiled (int): Maximum number of compiled templates to keep
+        
+    Returns:
+        jinja2.Environment: The environment
+    """
+    from jinja2 import Environment
+    
+    compiled = {}
+    
+    class CachingEnvironment(Environment):
+        def from_string(self, source, globals=None, template_class=None):
+            if globals is not None or template_class is not None:
+                return super().from_string(source, globals, template_class)
+                
+            template = compiled.get(source)
+            if template is None:
+                if len(compiled) >= max_compiled:
+                    compiled.clear()
+                template = compiled[source] = super().from_string(source)
+            return template
+            
+    return CachingEnvironment(autoescape=False)
+
+# Form generator of a generate_many worker process
+_worker_generator = None
+
+def _init_worker(config):
+    global _worker_generator
+    _worker_generator = FormGenerator(config)
+
+def _generate_in_worker(item):
+    return _worker_generator.generate(*item)
+
 class FormGenerator:
     """
     Class for generating documents from templates using extracted data
     """
     
+    # Default values for missing fields by name keyword, in order of priority
+    DEFAULT_VALUE_RULES = (
+        (('date',), EMPTY_DEFAULT),
+        (('amount', 'price', 'payment'), ZERO_AMOUNT_DEFAULT),
+        (('rate', 'percentage'), ZERO_RATE_DEFAULT)
+    )
+    
     def __init__(self, config=None):
         """
         Initialize the form generator
@@ -18,6 +208,77 @@ class FormGenerator:
             config (dict): Configuration for the form generator
         """
         self.config = config or {}
+        
+        # Raw bytes of file-based DOCX templates, keyed by path: (mtime, bytes)
+        self._template_cache = {}
+        # One Jinja environment shared by every render, created on first use
+        self._jinja_env = None
+        
+        # Output directories known to exist
+        self._known_dirs = set()
+        
+        # Default values already worked out for missing fields, and for
+        # whole templates keyed by their field set
+        self._default_cache = {}
+        self._default_contexts = {}
+        
+        # Formatters for the configured fields, built once
+        self._field_formatters = {}
+        for field, format_info in self.config.get('field_formats', {}).items():
+            builder = FORMATTERS.get(format_info.get('type', 'text'))
+            if builder:
+                self._field_formatters[field] = builder(format_info)
+    
+    @contextmanager
+    def _atomic_output(self, output_path):
+        """
+        Write an output file under a temporary name and move it into place when done
+        
+        Readers never see a partially written file, and a failed write leaves
+        any previous output untouched. Unless the 'durable' config option is
+        False, the file is also synced to disk before it's moved into place.
+        
+        Args:
+            output_path (str): Path of the output file
+            
+        Yields:
+            str: Temporary path to write the file to
+        """
+        # Unique per process and thread, so concurrent generations of the
+        # same output never write to or remove each other's temporary file
+        tmp_path = f"{output_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            yield tmp_path
+            if self.config.get('durable', True):
+                with open(tmp_path, 'rb+') as f:
+                    os.fsync(f.fileno())
+            os.replace(tmp_path, output_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    
+    def _get_template_bytes(self, template):
+        """
+        Get the content of a DOCX template, reading template files only once
+        
+        Args:
+            template: Template object
+            
+        Returns:
+            bytes: The template file content
+        """
+        if template.data is not None:
+            return template.data
+            
+        # Re-read the file if it changed since it was cached
+        mtime = os.stat(template.file_path).st_mtime
+        cached = self._template_cache.get(template.file_path)
+        if cached is None or cached[0] != mtime:
+            with open(template.file_path, 'rb') as f:
+                cached = (mtime, f.read())
+            self._template_cache[template.file_path] = cached
+            
+        return cached[1]
     
     def generate(self, data, template, output_path):
         """
@@ -31,8 +292,13 @@ class FormGenerator:
         Returns:
             bool: True if successful, False otherwise
         """
-        # Create output directory if it doesn't exist
-        os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+        # Create output directory if it doesn't exist, checking each directory only once
+        output_dir = os.path.dirname(output_path) or '.'
+        if not os.path.isabs(output_dir):
+            output_dir = os.path.abspath(output_dir)
+        if output_dir not in self._known_dirs:
+            os.makedirs(output_dir, exist_ok=True)
+            self._known_dirs.add(output_dir)
         
         # Determine template type and call appropriate method
         if template.template_type == 'docx':
@@ -40,9 +306,33 @@ class FormGenerator:
         elif template.template_type == 'json':
             return self._generate_from_json_template(data, template, output_path)
         else:
-            print(f"Unsupported template type: {template.template_type}")
+            logger.error(f"Unsupported template type: {template.template_type}")
             return False
     
+    def generate_many(self, items, max_workers=None):
+        """
+        Generate several documents in parallel worker processes
+        
+        Each worker builds its own form generator once, so template bytes
+        are cached per worker across the documents it renders.
+        
+        Args:
+            items (list): (data, template, output_path) tuples, as for generate
+            max_workers (int, optional): Number of worker processes (default: CPU count)
+            
+        Returns:
+            list: Whether each document was generated successfully, in order
+        """
+        items = list(items)
+        if len(items) < 2:
+            return [self.generate(*item) for item in items]
+            
+        max_workers = max_workers or os.cpu_count() or 1
+        chunksize = max(1, len(items) // (4 * max_workers))
+        
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(self.config,)) as executor:
+            return list(executor.map(_generate_in_worker, items, chunksize=chunksize))
+    
     def _generate_docx(self, data, template, output_path):
         """
         Generate a document from a DOCX template
@@ -56,42 +346,45 @@ class FormGenerator:
             bool: True if successful, False otherwise
         """
         try:
-            # Flatten the nested data structure
-            flat_data = self._flatten_data(data)
-            
             # Get template fields
-            template_fields = template.get_fields()
-            
-            # Check if we need to format any fields
-            field_formats = self.config.get('field_formats', {})
-            for field, format_info in field_formats.items():
-                if field in flat_data and flat_data[field]:
-                    flat_data[field] = self._format_field(flat_data[field], format_info)
+            template_fields = template.get_field_set()
             
-            # Create a clean context with only fields that exist in the template
-            context = {}
+            # Flatten the parts of the nested data structure the template uses
+            flat_data = self._flatten_data(data, fields=template_fields or None)
             
-            # First add all template fields that we have data for
-            for field in template_fields:
-                if field in flat_data:
-                    context[field] = flat_data[field]
-                else:
-                    # Handle missing fields
-                    context[field] = self._get_default_value(field)
+            # Check if we need to format any fields
+            for field, formatter in self._field_formatters.items():
+                value = flat_data.get(field)
+                if value:
+                    flat_data[field] = formatter(value)
             
-            # Add metadata fields
-            context['generation_date'] = datetime.now().strftime('%Y-%m-%d')
-            context['generation_time'] = datetime.now().strftime('%H:%M:%S')
+            # Create a clean context with only fields that exist in the template:
+            # the defaults for all of them, overlaid with the ones we have data for
+            # and the metadata fields. Jinja copies the context into a dict anyway,
+            # so it is built with a single merge.
+            generation_date, generation_time = _generation_stamp(int(time.time()))
+            context = {
+                **self._get_default_context(template_fields),
+                **{field: flat_data[field] for field in template_fields & flat_data.keys()},
+                'generation_date': generation_date,
+                'generation_time': generation_time
+            }
             
             # Load and render the template
-            docx_template = DocxTemplate(template.file_path)
-            docx_template.render(context)
-            docx_template.save(output_path)
+            from docxtpl import DocxTemplate
+            
+            if self._jinja_env is None:
+                self._jinja_env = _create_jinja_env()
+                
+            docx_template = DocxTemplate(io.BytesIO(self._get_template_bytes(template)))
+            docx_template.render(context, jinja_env=self._jinja_env)
+            with self._atomic_output(output_path) as tmp_path:
+                docx_template.save(tmp_path)
             
             return True
             
         except Exception as e:
-            print(f"Error generating document: {str(e)}")
+            logger.error(f"Error generating document: {str(e)}")
             return False
     
     def _generate_from_json_template(self, data, template, output_path):
@@ -110,7 +403,7 @@ class FormGenerator:
             # Since JSON templates can define any format, we'd implement custom logic
             # based on the template structure. This is a simplified example.
             if not hasattr(template, 'json_template'):
-                print("Invalid JSON template")
+                logger.error("Invalid JSON template")
                 return False
                 
             # Determine output format from the output path
@@ -118,26 +411,32 @@ class FormGenerator:
             
             if output_format == 'json':
                 # Simply save the extracted data as JSON
-                with open(output_path, 'w') as f:
-                    json.dump(data, f, indent=4)
+                with self._atomic_output(output_path) as tmp_path:
+                    json_utils.dump_file(data, tmp_path)
                 return True
                 
             elif output_format == 'docx':
                 # For JSON templates that define a DOCX output,
                 # we would generate a DOCX file based on the template structure
-                print("JSON to DOCX generation not fully implemented")
+                logger.warning("JSON to DOCX generation not fully implemented")
                 return False
                 
-            elif output_format in ['xlsx', 'xls']:
+            elif output_format == 'xlsx':
                 # Generate Excel file
                 return self._generate_excel(data, template, output_path)
                 
+            elif output_format == 'xls':
+                # xlsxwriter only writes the XLSX format, which Excel refuses
+                # to open under an .xls name
+                logger.error("XLS output is not supported, use xlsx instead")
+                return False
+                
             else:
-                print(f"Unsupported output format: {output_format}")
+                logger.error(f"Unsupported output format: {output_format}")
                 return False
                 
         except Exception as e:
-            print(f"Error generating document from JSON template: {str(e)}")
+            logger.error(f"Error generating document from JSON template: {str(e)}")
             return False
     
     def _generate_excel(self, data, template, output_path):
@@ -156,19 +455,24 @@ class FormGenerator:
             # Flatten the nested data structure for easier Excel generation
             flat_data = self._flatten_data(data)
             
-            # Convert to DataFrame
-            df = pd.DataFrame([flat_data])
+            import xlsxwriter
             
-            # Save to Excel
-            df.to_excel(output_path, index=False)
+            # Write a header row and a value row directly; in constant memory
+            # mode each row is flushed to disk as soon as it's complete
+            with self._atomic_output(output_path) as tmp_path:
+                workbook = xlsxwriter.Workbook(tmp_path, {'constant_memory': True})
+                worksheet = workbook.add_worksheet()
+                worksheet.write_row(0, 0, list(flat_data.keys()))
+                worksheet.write_row(1, 0, list(flat_data.values()))
+                workbook.close()
             
             return True
             
         except Exception as e:
-            print(f"Error generating Excel file: {str(e)}")
+            logger.error(f"Error generating Excel file: {str(e)}")
             return False
     
-    def _flatten_data(self, data, parent_key='', sep='_'):
+    def _flatten_data(self, data, parent_key='', sep='_', fields=None):
         """
         Flatten a nested dictionary
         
@@ -176,114 +480,73 @@ class FormGenerator:
             data (dict): The nested dictionary to flatten
             parent_key (str): The parent key
             sep (str): Separator for nested keys
+            fields (frozenset, optional): Only produce these flattened keys,
+                                          skipping subtrees that can't contain them
             
         Returns:
             dict: Flattened dictionary
         """
-        items = []
-        for k, v in data.items():
-            new_key = f"{parent_key}{sep}{k}" if parent_key else k
+        # Data that is already flat only needs its keys prefixed or filtered
+        # (copied either way, since callers modify the result)
+        if not any(isinstance(v, (dict, list)) for v in data.values()):
+            if parent_key:
+                flat_data = {f"{parent_key}{sep}{k}": v for k, v in data.items()}
+            else:
+                flat_data = dict(data)
+            if fields is not None:
+                flat_data = {k: v for k, v in flat_data.items() if k in fields}
+            return flat_data
             
-            if isinstance(v, dict):
-                items.extend(self._flatten_data(v, new_key, sep).items())
-            elif isinstance(v, list):
-                # For lists, we'll create keys with indices
-                if all(isinstance(x, dict) for x in v):
-                    # List of dictionaries - flatten each one
-                    for i, item in enumerate(v):
-                        items.extend(self._flatten_data(item, f"{new_key}{sep}{i}", sep).items())
-                else:
-                    # Simple list - join with commas
-                    items.append((new_key, ', '.join(str(x) for x in v)))
+        flat_data = {}
+        prefixes = _key_prefixes(fields, sep) if fields is not None else None
+        
+        # Walk the data with an explicit stack of iterators instead of
+        # recursing, which keeps the keys in their original order
+        stack = [(parent_key, iter(data.items()))]
+        while stack:
+            prefix, items = stack[-1]
+            for k, v in items:
+                new_key = f"{prefix}{sep}{k}" if prefix else k
+                
+                # Exact type checks first, since plain dicts and lists are by
+                # far the most common, then isinstance for their subclasses
+                if type(v) is dict or isinstance(v, dict):
+                    if prefixes is None or new_key in prefixes:
+                        stack.append((new_key, iter(v.items())))
+                        break
+                elif type(v) is list or isinstance(v, list):
+                    # For lists, we'll create keys with indices. Checking the
+                    # first item up front settles lists of scalars at once
+                    if not v or (isinstance(v[0], dict) and all(isinstance(x, dict) for x in v)):
+                        # List of dictionaries - flatten each one
+                        if prefixes is None or new_key in prefixes:
+                            stack.append((new_key, enumerate(v)))
+                            break
+                    elif fields is None or new_key in fields:
+                        # Simple list - join with commas
+                        flat_data[new_key] = ', '.join(map(str, v))
+                elif fields is None or new_key in fields:
+                    flat_data[new_key] = v
             else:
-                items.append((new_key, v))
+                stack.pop()
                 
-        return dict(items)
+        return flat_data
     
-    def _format_field(self, value, format_info):
+    def _get_default_context(self, fields):
         """
-        Format a field value based on format information
+        Get the default values for a set of template fields, worked out once per set
         
         Args:
-            value: The value to format
-            format_info (dict): Format information
+            fields (frozenset): Field names
             
         Returns:
-            Formatted value
+            dict: Default value for each field
         """
-        if not value:
-            return value
-            
-        format_type = format_info.get('type', 'text')
-        
-        if format_type == 'date':
-            try:
-                # Try to parse and format the date
-                # This is simplified - would need more robust date parsing
-                from dateutil.parser import parse
-                date_obj = parse(str(value))
-                date_format = format_info.get('format', '%Y-%m-%d')
-                return date_obj.strftime(date_format)
-            except:
-                return value
-                
-        elif format_type == 'currency':
-            try:
-                # Format as currency
-                if isinstance(value, str) and value.startswith('$'):
-                    value = value[1:]
-                amount = float(value.replace(',', ''))
-                currency_symbol = format_info.get('symbol', '$')
-                return f"{currency_symbol}{amount:,.2f}"
-            except:
-                return value
-                
-        elif format_type == 'number':
-            try:
-                # Format as number
-                if isinstance(value, str):
-                    value = value.replace(',', '')
-                num = float(value)
-                decimal_places = format_info.get('decimal_places', 2)
-                return f"{num:,.{decimal_places}f}"
-            except:
-                return value
-                
-        elif format_type == 'percentage':
-            try:
-                # Format as percentage
-                if isinstance(value, str) and value.endswith('%'):
-                    value = value[:-1]
-                pct = float(value)
-                decimal_places = format_info.get('decimal_places', 2)
-                return f"{pct:.{decimal_places}f}%"
-            except:
-                return value
-                
-        elif format_type == 'phone':
-            # Format as phone number (US format)
-            try:
-                # Remove non-numeric characters
-                phone = ''.join(c for c in str(value) if c.isdigit())
-                if len(phone) == 10:
-                    return f"({phone[0:3]}) {phone[3:6]}-{phone[6:]}"
-                return value
-            except:
-                return value
-                
-        elif format_type == 'boolean':
-            # Format as Yes/No
-            try:
-                if isinstance(value, bool):
-                    return "Yes" if value else "No"
-                elif isinstance(value, str):
-                    return "Yes" if value.lower() in ['true', 'yes', 'y', '1'] else "No"
-                return "Yes" if value else "No"
-            except:
-                return value
-                
-        # Default - return as is
-        return value
+        defaults = self._default_contexts.get(fields)
+        if defaults is None:
+            defaults = {field: self._get_default_value(field) for field in fields}
+            self._default_contexts[fields] = defaults
+        return defaults
     
     def _get_default_value(self, field):
         """
@@ -295,18 +558,23 @@ class FormGenerator:
         Returns:
             Default value for the field
         """
+        try:
+            return self._default_cache[field]
+        except KeyError:
+            pass
+            
         # Check if we have a default value configuration
         defaults = self.config.get('default_values', {})
         if field in defaults:
-            return defaults[field]
-            
-        # Common default values for field types
-        if 'date' in field.lower():
-            return ""
-        elif 'amount' in field.lower() or 'price' in field.lower() or 'payment' in field.lower():
-            return "$0.00"
-        elif 'rate' in field.lower() or 'percentage' in field.lower():
-            return "0%"
+            value = defaults[field]
+        else:
+            # Common default values for field types, or an empty string
+            name = field.lower()
+            value = next(
+                (default for keywords, default in self.DEFAULT_VALUE_RULES
+                 if any(keyword in name for keyword in keywords)),
+                EMPTY_DEFAULT
+            )
             
-        # Default empty string
-        return "" 
\ No newline at end of file
+        self._default_cache[field] = value
+        return value 
\ No newline at end of file
@@ -1,28 +1,278 @@
+import asyncio
+import heapq
+import logging
 import re
-import spacy
-import nltk
-from nltk.tokenize import sent_tokenize
-from nltk.corpus import stopwords
 import json
+import math
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import cached_property, lru_cache
 
-# Download required NLTK resources
-try:
-    nltk.data.find('tokenizers/punkt')
-except LookupError:
-    nltk.download('punkt')
+from utils.hyperscan_loader import build_prefilter
+from utils.normalize import parse_amount
+from utils.pattern_utils import LEADING_FLAGS_RE, pattern_flags
 
 try:
-    nltk.data.find('corpora/stopwords')
-except LookupError:
-    nltk.download('stopwords')
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+logger = logging.getLogger(__name__)
+
+# Prefix of model names that stand for a blank, rule-based pipeline
+BLANK_MODEL_PREFIX = 'blank:'
+
+@lru_cache(maxsize=4)
+def get_nlp(model_name, exclude=()):
+    """
+    Load a spaCy model, once per process
+    
+    Every analyzer shares the loaded model, and loading it before the server
+    forks its workers (see run.py) lets them share its memory.
+    
+    Args:
+        model_name (str): Name of the spaCy model
+        exclude (tuple): Components not to load at all
+        
+    Returns:
+        spacy.language.Language: The loaded model
+    """
+    import spacy
+    
+    try:
+        nlp = spacy.load(model_name, exclude=list(exclude))
+        print(f"Loaded spaCy model: {model_name}")
+    except OSError:
+        print(f"Downloading spaCy model: {model_name}")
+        spacy.cli.download(model_name)
+        nlp = spacy.load(model_name, exclude=list(exclude))
+    return nlp
+
+def build_blank_nlp(model_name, entity_patterns=None):
+    """
+    Build a rule-based spaCy pipeline for a 'blank:<language>' model name
+    
+    The pipeline has no statistical components, so it costs next to nothing to
+    build or run. Named entities come only from the entity ruler patterns.
+    
+    Args:
+        model_name (str): 'blank:' followed by a language code, e.g. 'blank:en'
+        entity_patterns (list, optional): spaCy entity ruler patterns
+        
+    Returns:
+        spacy.language.Language: The pipeline
+    """
+    import spacy
+    
+    nlp = spacy.blank(model_name[len(BLANK_MODEL_PREFIX):])
+    if entity_patterns:
+        ruler = nlp.add_pipe("entity_ruler")
+        ruler.add_patterns(entity_patterns)
+    print(f"Built rule-based spaCy pipeline: {model_name}")
+    return nlp
+
+@lru_cache(maxsize=256)
+def _rx(pattern, flags=0):
+    """
+    Compile a regex pattern, once per process
+    
+    Args:
+        pattern (str): Regex pattern
+        flags (int): Regex flags
+        
+    Returns:
+        re.Pattern: The compiled pattern
+    """
+    return re.compile(pattern, flags)
+
+# Starts of DATE entities that aren't specific dates, e.g. "today" or "monthly"
+DATE_STOPWORDS = ("today", "now", "current", "present", "annually", "monthly", "yearly", "daily")
+
+# Page markers added by the PDF extractor
+PAGE_RE = re.compile(r'---\s*Page\s+\d+\s*---')
+
+# Escape sequences and runs of other pattern characters
+PATTERN_TOKEN_RE = re.compile(r'(\\.)|([^\\]+)', re.DOTALL)
+
+def lowercase_pattern(pattern):
+    """
+    Convert a case-insensitive pattern into a case-sensitive one for lowercased text
+    
+    Case-sensitive patterns can use the regex engine's fast literal prefix
+    search, which case-insensitive ones can't, so searching lowercased text with
+    them is several times faster. Match positions are the same as long as
+    lowercasing didn't change the length of the text.
+    
+    Args:
+        pattern (re.Pattern): Compiled case-insensitive regex pattern
+        
+    Returns:
+        re.Pattern: The case-sensitive pattern, or None if it can't be converted
+    """
+    if not pattern.flags & re.IGNORECASE or pattern.groupindex:
+        return None
+    
+    # Lowercase everything except escape sequences such as \A and \S
+    source = LEADING_FLAGS_RE.sub('', pattern.pattern)
+    source = PATTERN_TOKEN_RE.sub(lambda m: m.group(1) or m.group(2).lower(), source)
+    
+    try:
+        return re.compile(source, pattern.flags & ~re.IGNORECASE)
+    except re.error:
+        return None
 
 class DocumentAnalyzer:
     """
     Class for analyzing legal documents using NLP techniques to extract structured data
     """
     
+    # Maximum size of the text chunks fed to spaCy, in characters
+    MAX_CHUNK_SIZE = 100000
+    
+    # Number of chunks spaCy processes at a time
+    SPACY_BATCH_SIZE = 32
+    
+    # spaCy components whose output is never used (only named entities are),
+    # which aren't loaded unless the 'disabled_pipes' setting says otherwise
+    UNUSED_PIPES = ("tagger", "parser", "attribute_ruler", "lemmatizer")
+    
+    # Keywords that identify each document type
+    DOCUMENT_TYPES = {
+        "lease_agreement": ["lease agreement", "rental agreement", "tenancy agreement"],
+        "mortgage": ["mortgage", "deed of trust", "security deed"],
+        "purchase_agreement": ["purchase agreement", "sales contract", "contract of sale", "real estate contract"],
+        "deed": ["warranty deed", "quitclaim deed", "special warranty deed", "grant deed"],
+        "promissory_note": ["promissory note", "loan note"],
+        "disclosure": ["disclosure statement", "property disclosure"],
+        "title_insurance": ["title insurance", "title policy"],
+        "closing_statement": ["closing statement", "settlement statement", "hud-1"]
+    }
+    
+    # Common section headers in legal documents
+    SECTION_PATTERNS = [
+        (r'(?i)(?:\n|\r|\A)\s*(?:[IVX0-9]+\.)?\s*(?:RECITALS|WITNESSETH)[\s:]*', "recitals"),
+        (r'(?i)(?:\n|\r|\A)\s*(?:[IVX0-9]+\.)?\s*(?:DEFINITIONS|DEFINED TERMS)[\s:]*', "definitions"),
+        (r'(?i)(?:\n|\r|\A)\s*(?:[IVX0-9]+\.)?\s*(?:PROPERTY DESCRIPTION|LEGAL DESCRIPTION)[\s:]*', "property_description"),
+        (r'(?i)(?:\n|\r|\A)\s*(?:[IVX0-9]+\.)?\s*(?:PURCHASE PRICE|CONSIDERATION|PAYMENT)[\s:]*', "payment_terms"),
+        (r'(?i)(?:\n|\r|\A)\s*(?:[IVX0-9]+\.)?\s*(?:REPRESENTATIONS|WARRANTIES)[\s:]*', "representations"),
+        (r'(?i)(?:\n|\r|\A)\s*(?:[IVX0-9]+\.)?\s*(?:COVENANTS)[\s:]*', "covenants"),
+        (r'(?i)(?:\n|\r|\A)\s*(?:[IVX0-9]+\.)?\s*(?:CONDITIONS PRECEDENT|CONDITIONS)[\s:]*', "conditions"),
+        (r'(?i)(?:\n|\r|\A)\s*(?:[IVX0-9]+\.)?\s*(?:TERM|DURATION)[\s:]*', "term"),
+        (r'(?i)(?:\n|\r|\A)\s*(?:[IVX0-9]+\.)?\s*(?:TERMINATION)[\s:]*', "termination"),
+        (r'(?i)(?:\n|\r|\A)\s*(?:[IVX0-9]+\.)?\s*(?:DEFAULT|BREACH)[\s:]*', "default"),
+        (r'(?i)(?:\n|\r|\A)\s*(?:[IVX0-9]+\.)?\s*(?:REMEDIES)[\s:]*', "remedies"),
+        (r'(?i)(?:\n|\r|\A)\s*(?:[IVX0-9]+\.)?\s*(?:GOVERNING LAW|APPLICABLE LAW)[\s:]*', "governing_law"),
+        (r'(?i)(?:\n|\r|\A)\s*(?:[IVX0-9]+\.)?\s*(?:NOTICES)[\s:]*', "notices"),
+        (r'(?i)(?:\n|\r|\A)\s*(?:[IVX0-9]+\.)?\s*(?:MISCELLANEOUS|GENERAL PROVISIONS)[\s:]*', "miscellaneous")
+    ]
+    
+    # Patterns for the parties to an agreement, in order of preference
+    PARTY_PATTERNS = {
+        "buyer": [
+            r"(?i)buyer:?\s*([^,\n\r\.]{3,50})",
+            r"(?i)purchaser:?\s*([^,\n\r\.]{3,50})",
+            r"(?i)HEREINAFTER\s+(?:called|referred to as)[^,\n\r]*\"?(?:buyer|purchaser)\"?[^,\n\r]*,\s*([^,\n\r\.]{3,50})"
+        ],
+        "seller": [
+            r"(?i)seller:?\s*([^,\n\r\.]{3,50})",
+            r"(?i)vendor:?\s*([^,\n\r\.]{3,50})",
+            r"(?i)HEREINAFTER\s+(?:called|referred to as)[^,\n\r]*\"?(?:seller|vendor)\"?[^,\n\r]*,\s*([^,\n\r\.]{3,50})"
+        ],
+        "lender": [
+            r"(?i)lender:?\s*([^,\n\r\.]{3,50})",
+            r"(?i)mortgagee:?\s*([^,\n\r\.]{3,50})",
+            r"(?i)HEREINAFTER\s+(?:called|referred to as)[^,\n\r]*\"?(?:lender|mortgagee)\"?[^,\n\r]*,\s*([^,\n\r\.]{3,50})"
+        ],
+        "borrower": [
+            r"(?i)borrower:?\s*([^,\n\r\.]{3,50})",
+            r"(?i)mortgagor:?\s*([^,\n\r\.]{3,50})",
+            r"(?i)HEREINAFTER\s+(?:called|referred to as)[^,\n\r]*\"?(?:borrower|mortgagor)\"?[^,\n\r]*,\s*([^,\n\r\.]{3,50})"
+        ],
+        "lessor": [
+            r"(?i)lessor:?\s*([^,\n\r\.]{3,50})",
+            r"(?i)landlord:?\s*([^,\n\r\.]{3,50})",
+            r"(?i)HEREINAFTER\s+(?:called|referred to as)[^,\n\r]*\"?(?:lessor|landlord)\"?[^,\n\r]*,\s*([^,\n\r\.]{3,50})"
+        ],
+        "lessee": [
+            r"(?i)lessee:?\s*([^,\n\r\.]{3,50})",
+            r"(?i)tenant:?\s*([^,\n\r\.]{3,50})",
+            r"(?i)HEREINAFTER\s+(?:called|referred to as)[^,\n\r]*\"?(?:lessee|tenant)\"?[^,\n\r]*,\s*([^,\n\r\.]{3,50})"
+        ]
+    }
+    
+    # Patterns for the important dates of an agreement, in order of preference
+    DATE_PATTERNS = {
+        "agreement_date": [
+            r"(?i)(?:THIS\s+AGREEMENT|THIS\s+CONTRACT)[^.]*?dated\s+(?:as of\s+)?([A-Za-z]+\s+\d{1,2}(?:st|nd|rd|th)?,?\s+\d{4}|\d{1,2}[/-]\d{1,2}[/-]\d{2,4})",
+            r"(?i)DATED:?\s*([A-Za-z]+\s+\d{1,2}(?:st|nd|rd|th)?,?\s+\d{4}|\d{1,2}[/-]\d{1,2}[/-]\d{2,4})",
+            r"(?i)dated\s+(?:as of\s+)?(?:the\s+)?(\d{1,2}(?:st|nd|rd|th)?\s+day\s+of\s+[A-Za-z]+,?\s+\d{4})"
+        ],
+        "effective_date": [
+            r"(?i)effective\s+(?:date|as of)(?:\s+the)?\s+(?:date\s+of\s+)?([A-Za-z]+\s+\d{1,2}(?:st|nd|rd|th)?,?\s+\d{4}|\d{1,2}[/-]\d{1,2}[/-]\d{2,4})",
+            r"(?i)effective\s+(?:date|as of)(?:\s+the)?\s+(?:date\s+of\s+)?(?:the\s+)?(\d{1,2}(?:st|nd|rd|th)?\s+day\s+of\s+[A-Za-z]+,?\s+\d{4})"
+        ],
+        "closing_date": [
+            r"(?i)closing\s+date:?\s*([A-Za-z]+\s+\d{1,2}(?:st|nd|rd|th)?,?\s+\d{4}|\d{1,2}[/-]\d{1,2}[/-]\d{2,4})",
+            r"(?i)date\s+of\s+closing:?\s*([A-Za-z]+\s+\d{1,2}(?:st|nd|rd|th)?,?\s+\d{4}|\d{1,2}[/-]\d{1,2}[/-]\d{2,4})"
+        ],
+        "execution_date": [
+            r"(?i)executed\s+(?:on|as of)(?:\s+the)?\s+(?:date\s+of\s+)?([A-Za-z]+\s+\d{1,2}(?:st|nd|rd|th)?,?\s+\d{4}|\d{1,2}[/-]\d{1,2}[/-]\d{2,4})",
+            r"(?i)executed\s+(?:on|as of)(?:\s+the)?\s+(?:date\s+of\s+)?(?:the\s+)?(\d{1,2}(?:st|nd|rd|th)?\s+day\s+of\s+[A-Za-z]+,?\s+\d{4})"
+        ]
+    }
+    
+    # Patterns for monetary amounts, in order of preference
+    MONEY_PATTERNS = {
+        "purchase_price": [
+            r"(?i)purchase\s+price:?\s*\$?([0-9,]+(?:\.[0-9]{2})?)",
+            r"(?i)total\s+consideration:?\s*\$?([0-9,]+(?:\.[0-9]{2})?)",
+            r"(?i)sales\s+price:?\s*\$?([0-9,]+(?:\.[0-9]{2})?)"
+        ],
+        "loan_amount": [
+            r"(?i)loan\s+amount:?\s*\$?([0-9,]+(?:\.[0-9]{2})?)",
+            r"(?i)principal\s+(?:sum|amount):?\s*\$?([0-9,]+(?:\.[0-9]{2})?)",
+            r"(?i)mortgage\s+amount:?\s*\$?([0-9,]+(?:\.[0-9]{2})?)"
+        ],
+        "deposit_amount": [
+            r"(?i)deposit:?\s*\$?([0-9,]+(?:\.[0-9]{2})?)",
+            r"(?i)earnest\s+money:?\s*\$?([0-9,]+(?:\.[0-9]{2})?)"
+        ],
+        "monthly_payment": [
+            r"(?i)monthly\s+payment:?\s*\$?([0-9,]+(?:\.[0-9]{2})?)",
+            r"(?i)monthly\s+rent:?\s*\$?([0-9,]+(?:\.[0-9]{2})?)"
+        ],
+        "interest_rate": [
+            r"(?i)interest\s+rate:?\s*([0-9\.]+)(?:%|\s+percent)",
+            r"(?i)at\s+(?:the\s+)?(?:annual\s+)?(?:rate\s+)?(?:of\s+)?([0-9\.]+)(?:%|\s+percent)\s+(?:interest|per\s+annum)"
+        ]
+    }
+    
+    # Patterns for property information, in order of preference
+    PROPERTY_PATTERNS = {
+        "address": [
+            r"(?i)property\s+address:?\s*([^,\n\r\.]{3,100}(?:,\s*[^,\n\r\.]{3,50}){1,3})",
+            r"(?i)real\s+property\s+located\s+at:?\s*([^,\n\r\.]{3,100}(?:,\s*[^,\n\r\.]{3,50}){1,3})",
+            r"(?i)premises\s+located\s+at:?\s*([^,\n\r\.]{3,100}(?:,\s*[^,\n\r\.]{3,50}){1,3})",
+            r"(?i)property\s+commonly\s+known\s+as:?\s*([^,\n\r\.]{3,100}(?:,\s*[^,\n\r\.]{3,50}){1,3})"
+        ],
+        "legal_description": [
+            r"(?i)legal\s+description:?\s*\n*((?:[^\n\r]{3,200}\n*){1,10})"
+        ],
+        "property_type": [
+            r"(?i)property\s+type:?\s*([^,\n\r\.]{3,50})",
+            r"(?i)type\s+of\s+property:?\s*([^,\n\r\.]{3,50})"
+        ],
+        "parcel_number": [
+            r"(?i)(?:parcel|tax|assessor(?:'s)?)\s+(?:id|identification|number):?\s*([^,\n\r\.]{3,50})",
+            r"(?i)APN:?\s*([^,\n\r\.]{3,50})"
+        ],
+        "square_footage": [
+            r"(?i)(?:square\s+feet|sq\.\s*ft\.|sf):?\s*([0-9,]+)",
+            r"(?i)(?:approximately|approx\.)\s+([0-9,]+)\s+(?:square\s+feet|sq\.\s*ft\.|sf)"
+        ]
+    }
+    
     def __init__(self, config=None):
         """
         Initialize the document analyzer
@@ -32,9 +282,11 @@ class DocumentAnalyzer:
         """
         self.config = config or {}
         
-        # Load spaCy model
-        self.nlp = None
-        self.load_spacy_model()
+        # The spaCy model is loaded when first needed (see nlp)
+        self.max_chunk_size = self.config.get('spacy_max_chunk_size', self.MAX_CHUNK_SIZE)
+        self.batch_size = self.config.get('spacy_batch_size', self.SPACY_BATCH_SIZE)
+        # Most processes nlp.pipe may use (see _pipe_processes)
+        self.n_process = self.config.get('spacy_n_process', max(1, (os.cpu_count() or 1) // 2))
         
         # Load extraction patterns
         self.patterns = self.config.get('extraction_patterns', {})
@@ -42,24 +294,72 @@ class DocumentAnalyzer:
         # Compile regex patterns
         self.compiled_patterns = self._compile_patterns()
         
+        # Compile the built-in patterns
+        self.section_patterns = [(re.compile(pattern), name) for pattern, name in self.SECTION_PATTERNS]
+        self.party_patterns = self._compile_pattern_table(self.PARTY_PATTERNS)
+        self.date_patterns = self._compile_pattern_table(self.DATE_PATTERNS)
+        self.money_patterns = self._compile_pattern_table(self.MONEY_PATTERNS)
+        self.property_patterns = self._compile_pattern_table(self.PROPERTY_PATTERNS)
+        
+        # Case-sensitive versions of the built-in patterns, for lowercased text
+        self.lowered_patterns = {}
+        for table in (self.party_patterns, self.date_patterns, self.money_patterns, self.property_patterns):
+            for field_patterns in table.values():
+                for pattern in field_patterns:
+                    lowered = lowercase_pattern(pattern)
+                    if lowered is not None:
+                        self.lowered_patterns[pattern] = lowered
+        
+        lowered_headers = [(lowercase_pattern(pattern), name) for pattern, name in self.section_patterns]
+        self.lowered_section_patterns = None
+        if all(pattern is not None for pattern, _ in lowered_headers):
+            self.lowered_section_patterns = lowered_headers
+        
+        # Hyperscan prefilter that rules out the patterns a document can't match
+        self.prefilter = None
+        if self.config.get('use_hyperscan', True):
+            self.prefilter = build_prefilter(self._prefilter_patterns())
+        
         # Load entity extraction rules
         self.entity_rules = self.config.get('entity_rules', {})
         
+        # Automaton for finding document type keywords
+        self.keyword_automaton = self._build_keyword_automaton()
+        
         # Common real estate terms dictionary
         self.real_estate_terms = self._load_real_estate_terms()
         
-    def load_spacy_model(self):
+    @cached_property
+    def nlp(self):
         """
-        Load the spaCy NLP model
+        The spaCy NLP model, loaded on first use
+        
+        Returns:
+            spacy.language.Language: The model, or None if spaCy is turned off
+                                     with the 'use_spacy' setting
         """
+        if not self.config.get('use_spacy', True):
+            return None
+        
         model_name = self.config.get('spacy_model', 'en_core_web_sm')
-        try:
-            self.nlp = spacy.load(model_name)
-            print(f"Loaded spaCy model: {model_name}")
-        except OSError:
-            print(f"Downloading spaCy model: {model_name}")
-            spacy.cli.download(model_name)
-            self.nlp = spacy.load(model_name)
+        if model_name.startswith(BLANK_MODEL_PREFIX):
+            nlp = build_blank_nlp(model_name, self.config.get('entity_patterns'))
+        else:
+            nlp = get_nlp(model_name, tuple(self.config.get('disabled_pipes', self.UNUSED_PIPES)))
+        
+        # Make sure spaCy accepts chunks of the configured size
+        if nlp.max_length < self.max_chunk_size:
+            nlp.max_length = self.max_chunk_size
+        return nlp
+    
+    def load_spacy_model(self):
+        """
+        Load the spaCy NLP model now, rather than when it is first needed
+        
+        Returns:
+            spacy.language.Language: The model, or None if spaCy is turned off
+        """
+        return self.nlp
     
     def _compile_patterns(self):
         """
@@ -68,6 +368,10 @@ class DocumentAnalyzer:
         Returns:
             dict: Dictionary of compiled patterns
         """
+        # Patterns already compiled by the config loader
+        if self.config.get('compiled_patterns') is not None:
+            return dict(self.config['compiled_patterns'])
+        
         compiled = {}
         
         for field, pattern_info in self.patterns.items():
@@ -77,18 +381,54 @@ class DocumentAnalyzer:
                     compiled[field] = re.compile(pattern_info, re.IGNORECASE | re.MULTILINE)
                 elif isinstance(pattern_info, dict):
                     # Pattern with options
-                    pattern = pattern_info.get('pattern', '')
-                    flags = 0
-                    if pattern_info.get('case_insensitive', True):
-                        flags |= re.IGNORECASE
-                    if pattern_info.get('multiline', True):
-                        flags |= re.MULTILINE
-                    compiled[field] = re.compile(pattern, flags)
+                    compiled[field] = re.compile(pattern_info.get('pattern', ''), pattern_flags(pattern_info))
             except re.error as e:
-                print(f"Error compiling pattern for '{field}': {str(e)}")
+                logger.error(f"Error compiling pattern for '{field}': {str(e)}")
                 
         return compiled
     
+    def _compile_pattern_table(self, table):
+        """
+        Compile a table of built-in patterns
+        
+        Args:
+            table (dict): Lists of pattern strings by field, in order of preference
+            
+        Returns:
+            dict: Lists of compiled patterns by field
+        """
+        return {field: [re.compile(pattern) for pattern in patterns] for field, patterns in table.items()}
+    
+    def _prefilter_patterns(self):
+        """
+        Get every pattern the extraction methods search documents with
+        
+        Returns:
+            list: Compiled regex patterns
+        """
+        patterns = list(self.compiled_patterns.values())
+        for table in (self.party_patterns, self.date_patterns, self.money_patterns, self.property_patterns):
+            for field_patterns in table.values():
+                patterns.extend(field_patterns)
+        return patterns
+    
+    def _build_keyword_automaton(self):
+        """
+        Build an Aho-Corasick automaton for the document type keywords
+        
+        Returns:
+            ahocorasick.Automaton: The automaton, or None if pyahocorasick isn't installed
+        """
+        if ahocorasick is None:
+            return None
+        
+        automaton = ahocorasick.Automaton()
+        for keywords in self.DOCUMENT_TYPES.values():
+            for keyword in keywords:
+                automaton.add_word(keyword, keyword)
+        automaton.make_automaton()
+        return automaton
+    
     def _load_real_estate_terms(self):
         """
         Load common real estate terms
@@ -116,10 +456,205 @@ class DocumentAnalyzer:
             ]
         }
     
-    def analyze(self, document):
+    def _chunk_text(self, text, pages=None):
+        """
+        Split text into chunks for spaCy, one per page
+        
+        Chunks follow the page markers added by the PDF extractor, so entities
+        aren't cut in half at chunk boundaries. Pages longer than the maximum
+        chunk size are split at paragraph breaks, or failing that at spaces.
+        Chunks are sliced from the text as they are needed.
+        
+        Args:
+            text (str): Document text content
+            pages (list, optional): Text of each page, if already split
+            
+        Yields:
+            str: Text chunks
+        """
+        if pages is not None:
+            for page in pages:
+                yield from self._chunk_page(page, 0, len(page))
+            return
+        
+        start = 0
+        for marker in PAGE_RE.finditer(text):
+            yield from self._chunk_page(text, start, marker.start())
+            start = marker.end()
+        yield from self._chunk_page(text, start, len(text))
+    
+    def _chunk_page(self, text, start, end):
+        """
+        Split one page of text into chunks no longer than the maximum chunk size
+        
+        Args:
+            text (str): Document text content
+            start (int): Start of the page in the text
+            end (int): End of the page in the text
+            
+        Yields:
+            str: Text chunks, skipping blank ones
+        """
+        while end - start > self.max_chunk_size:
+            limit = start + self.max_chunk_size
+            cut = text.rfind('\n\n', start, limit)
+            if cut <= start:
+                cut = text.rfind(' ', start, limit)
+            if cut <= start:
+                cut = limit
+            chunk = text[start:cut]
+            if chunk.strip():
+                yield chunk
+            start = cut
+        
+        chunk = text[start:end]
+        if chunk.strip():
+            yield chunk
+    
+    def _count_chunks(self, text, pages=None):
+        """
+        Estimate how many chunks _chunk_text splits a document into, without slicing them
+        
+        Args:
+            text (str): Document text content
+            pages (list, optional): Text of each page, if already split
+            
+        Returns:
+            int: Estimated number of chunks
+        """
+        if pages is not None:
+            return sum(math.ceil(len(page) / self.max_chunk_size) for page in pages)
+        n_markers = sum(1 for _ in PAGE_RE.finditer(text))
+        return n_markers + math.ceil(len(text) / self.max_chunk_size)
+    
+    def _pipe_processes(self, n_chunks):
+        """
+        Get the number of processes to run nlp.pipe with
+        
+        Worker processes only pay for their startup when each gets whole
+        batches, so smaller inputs are processed in this process.
+        
+        Args:
+            n_chunks (int): Number of chunks to process
+            
+        Returns:
+            int: Number of processes
+        """
+        if self.n_process > 1 and n_chunks >= self.n_process * self.batch_size:
+            return self.n_process
+        return 1
+    
+    def _process_chunks(self, text, pages=None):
+        """
+        Run spaCy over a document's chunks as one batch
+        
+        Args:
+            text (str): Document text content
+            pages (list, optional): Text of each page, if already split
+            
+        Returns:
+            list: spaCy Docs for the chunks (empty if processing failed)
+        """
+        try:
+            return list(self.nlp.pipe(
+                self._chunk_text(text, pages),
+                batch_size=self.batch_size,
+                n_process=self._pipe_processes(self._count_chunks(text, pages))
+            ))
+        except Exception as e:
+            logger.error(f"Error processing chunks with spaCy: {str(e)}")
+            return []
+    
+    def analyze_batch(self, documents):
+        """
+        Analyze several documents, running spaCy over all of them as one batch
+        
+        Args:
+            documents (list): Document objects containing text content
+            
+        Returns:
+            list: Extracted data for each document, in the same order
+        """
+        nlp_docs = [None] * len(documents)
+        
+        if self.nlp:
+            n_process = self._pipe_processes(sum(
+                self._count_chunks(document.content, document.pages)
+                for document in documents if document.content
+            ))
+            
+            # Feed the chunks of every document through a single nlp.pipe
+            # call, tagged with the index of the document they came from
+            chunks = (
+                (chunk, i)
+                for i, document in enumerate(documents) if document.content
+                for chunk in self._chunk_text(document.content, document.pages)
+            )
+            
+            try:
+                nlp_docs = [[] for _ in documents]
+                for doc, i in self.nlp.pipe(
+                    chunks,
+                    as_tuples=True,
+                    batch_size=self.batch_size,
+                    n_process=n_process
+                ):
+                    nlp_docs[i].append(doc)
+            except Exception as e:
+                logger.error(f"Error processing batch with spaCy: {str(e)}")
+                nlp_docs = [None] * len(documents)
+        
+        return [self.analyze(document, nlp_docs=docs) for document, docs in zip(documents, nlp_docs)]
+    
+    def analyze_batch_columns(self, documents):
+        """
+        Analyze several documents, with the results arranged by field
+        
+        Each field maps to a list with one value per document (None where a
+        document has no value), which serializes as a handful of arrays
+        instead of a dictionary per document.
+        
+        Args:
+            documents (list): Document objects containing text content
+            
+        Returns:
+            dict: Lists of values by field, in document order
+        """
+        results = self.analyze_batch(documents)
+        
+        # Fields in the order they first appear
+        fields = dict.fromkeys(field for result in results for field in result)
+        return {field: [result.get(field) for result in results] for field in fields}
+    
+    def analyze(self, document, nlp_docs=None):
         """
         Analyze a document and extract structured data
         
+        Args:
+            document: Document object containing text content
+            nlp_docs (list, optional): spaCy Docs for the document's text chunks,
+                                       if already processed (see analyze_batch)
+            
+        Returns:
+            dict: Extracted data
+        """
+        if not document.content:
+            return {}
+            
+        # Run spaCy once; entity and date extraction share the Docs
+        if nlp_docs is None and self.nlp:
+            nlp_docs = self._process_chunks(document.content, document.pages)
+        
+        return self._analyze(document, lambda: nlp_docs)
+    
+    async def analyze_async(self, document):
+        """
+        Analyze a document without blocking the event loop
+        
+        spaCy processes the document in one worker thread while the pattern
+        based extraction runs in another, which only waits for the spaCy Docs
+        once it gets to the entities and dates.
+        
         Args:
             document: Document object containing text content
             
@@ -128,44 +663,85 @@ class DocumentAnalyzer:
         """
         if not document.content:
             return {}
+        
+        # Submitted first, so it can't be left waiting behind the extraction
+        # that needs its result
+        nlp_future = self._executor.submit(self._process_chunks, document.content, document.pages) if self.nlp else None
+        get_nlp_docs = nlp_future.result if nlp_future else lambda: None
+        
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._analyze, document, get_nlp_docs)
+    
+    @cached_property
+    def _executor(self):
+        """
+        Thread pool for analyze_async
+        
+        Returns:
+            ThreadPoolExecutor: The thread pool
+        """
+        return ThreadPoolExecutor(max_workers=self.config.get('analysis_threads', 4))
+    
+    def _analyze(self, document, get_nlp_docs):
+        """
+        Extract structured data from a document's text
+        
+        Args:
+            document: Document object containing text content
+            get_nlp_docs (callable): Called with no arguments to get the spaCy Docs
+                                     for the document's text chunks (or None)
+            
+        Returns:
+            dict: Extracted data
+        """
+        # Patterns that may match the document (None when all have to be tried)
+        possible = self.prefilter.possible_matches(document.content) if self.prefilter else None
+        
+        # Lowercase the text once for the classification and built-in patterns;
+        # positions only carry over if lowercasing kept the length the same
+        text_lower = document.content.lower()
+        if len(text_lower) != len(document.content):
+            text_lower = None
             
-        # Extract data using various methods
-        extracted_data = {}
+        # Extract what doesn't need spaCy first, so analyze_async only waits
+        # for the Docs once it gets to the entities and dates
         
         # Basic document classification
-        doc_type = self._classify_document(document.content)
+        doc_type = self._classify_document(document.content, text_lower)
         document.set_document_type(doc_type)
-        extracted_data['document_type'] = doc_type
         
         # Extract data using regex patterns
-        regex_data = self._extract_with_regex(document.content)
-        extracted_data.update(regex_data)
+        regex_data = self._extract_with_regex(document.content, possible)
+        
+        # Extract structured sections
+        sections = self._extract_sections(document.content, document.pages)
+        
+        # Special case for parties
+        parties = self._extract_parties(document.content, possible, text_lower)
+        
+        # Extract monetary amounts
+        monetary = self._extract_monetary_amounts(document.content, possible, text_lower)
+        
+        # Extract property information
+        property_info = self._extract_property_info(document.content, possible, text_lower)
         
         # Extract entities using spaCy
-        entity_data = self._extract_entities(document.content)
+        nlp_docs = get_nlp_docs()
+        entity_data = self._extract_entities(document.content, nlp_docs)
+        
+        # Extract dates, reusing the DATE entities found above
+        dates = self._extract_dates(document.content, nlp_docs, possible, text_lower, entity_data.get('dates'))
+        
+        extracted_data = {'document_type': doc_type}
+        extracted_data.update(regex_data)
         # Merge entity data - don't overwrite regex results
         for key, value in entity_data.items():
             if key not in extracted_data or not extracted_data[key]:
                 extracted_data[key] = value
-        
-        # Extract structured sections
-        sections = self._extract_sections(document.content)
         extracted_data['sections'] = sections
-        
-        # Special case for parties
-        parties = self._extract_parties(document.content)
         extracted_data['parties'] = parties
-        
-        # Extract dates
-        dates = self._extract_dates(document.content)
         extracted_data['dates'] = dates
-        
-        # Extract monetary amounts
-        monetary = self._extract_monetary_amounts(document.content)
         extracted_data['monetary_values'] = monetary
-        
-        # Extract property information
-        property_info = self._extract_property_info(document.content)
         extracted_data['property'] = property_info
         
         # Update the document with extracted data
@@ -173,34 +749,35 @@ class DocumentAnalyzer:
         
         return extracted_data
     
-    def _classify_document(self, text):
+    def _classify_document(self, text, text_lower=None):
         """
         Classify the document type
         
         Args:
             text (str): Document text content
+            text_lower (str, optional): The text lowercased
             
         Returns:
             str: Document type
         """
         # Simple keyword-based classification
-        text_lower = text.lower()
-        
-        doc_types = {
-            "lease_agreement": ["lease agreement", "rental agreement", "tenancy agreement"],
-            "mortgage": ["mortgage", "deed of trust", "security deed"],
-            "purchase_agreement": ["purchase agreement", "sales contract", "contract of sale", "real estate contract"],
-            "deed": ["warranty deed", "quitclaim deed", "special warranty deed", "grant deed"],
-            "promissory_note": ["promissory note", "loan note"],
-            "disclosure": ["disclosure statement", "property disclosure"],
-            "title_insurance": ["title insurance", "title policy"],
-            "closing_statement": ["closing statement", "settlement statement", "hud-1"]
-        }
+        if text_lower is None:
+            text_lower = text.lower()
+        
+        if self.keyword_automaton is not None:
+            # A single pass over the text finds every keyword it contains
+            found = {keyword for _, keyword in self.keyword_automaton.iter(text_lower)}
+        else:
+            found = {
+                keyword
+                for keywords in self.DOCUMENT_TYPES.values()
+                for keyword in keywords if keyword in text_lower
+            }
         
         # Count matches for each document type
         matches = {}
-        for doc_type, keywords in doc_types.items():
-            count = sum(1 for keyword in keywords if keyword in text_lower)
+        for doc_type, keywords in self.DOCUMENT_TYPES.items():
+            count = sum(1 for keyword in keywords if keyword in found)
             matches[doc_type] = count
         
         # Get the type with the most matches
@@ -213,12 +790,36 @@ class DocumentAnalyzer:
         
         return "unknown"
     
-    def _extract_with_regex(self, text):
+    def _search(self, pattern, text, text_lower=None):
+        """
+        Search text with a built-in pattern, scanning the lowercased text if given
+        
+        Args:
+            pattern (re.Pattern): Compiled regex pattern
+            text (str): Text to search
+            text_lower (str, optional): The text lowercased, with the same length
+            
+        Returns:
+            re.Match: The first match in the original text, or None
+        """
+        lowered = self.lowered_patterns.get(pattern)
+        if lowered is None or text_lower is None:
+            return pattern.search(text)
+        
+        match = lowered.search(text_lower)
+        if match is None:
+            return None
+        
+        # Match again at the same position to get the groups in their original case
+        return pattern.match(text, match.start()) or pattern.search(text, match.start())
+    
+    def _extract_with_regex(self, text, possible=None):
         """
         Extract data using regex patterns
         
         Args:
             text (str): Document text content
+            possible (set, optional): Patterns that may match the text, from the prefilter
             
         Returns:
             dict: Extracted data
@@ -226,25 +827,27 @@ class DocumentAnalyzer:
         extracted = {}
         
         for field, pattern in self.compiled_patterns.items():
+            if possible is not None and pattern.pattern not in possible:
+                continue
             try:
                 match = pattern.search(text)
                 if match:
                     # Get value from first group or full match
-                    if match.groups():
-                        extracted[field] = match.group(1).strip()
-                    else:
-                        extracted[field] = match.group(0).strip()
+                    value = match.group(1) if match.groups() else match.group(0)
+                    if value is not None:
+                        extracted[field] = value.strip()
             except Exception as e:
-                print(f"Error extracting '{field}' with regex: {str(e)}")
+                logger.error(f"Error extracting '{field}' with regex: {str(e)}")
         
         return extracted
     
-    def _extract_entities(self, text):
+    def _extract_entities(self, text, nlp_docs=None):
         """
         Extract named entities using spaCy
         
         Args:
             text (str): Document text content
+            nlp_docs (list, optional): Already processed spaCy Docs for the text
             
         Returns:
             dict: Extracted entities
@@ -252,103 +855,105 @@ class DocumentAnalyzer:
         if not self.nlp:
             return {}
             
+        # Dicts keep each entity once, in the order it was first found
         entities = {
-            "people": [],
-            "organizations": [],
-            "locations": [],
-            "dates": []
+            "people": {},
+            "organizations": {},
+            "locations": {},
+            "dates": {}
         }
         
-        # Process text in chunks to avoid memory issues with large documents
-        chunk_size = 5000  # characters
-        chunks = [text[i:i+chunk_size] for i in range(0, len(text), chunk_size)]
+        if nlp_docs is None:
+            nlp_docs = self._process_chunks(text)
         
-        for chunk in chunks:
-            try:
-                doc = self.nlp(chunk)
-                
-                for ent in doc.ents:
-                    if ent.label_ == "PERSON":
-                        if ent.text not in entities["people"]:
-                            entities["people"].append(ent.text)
-                    elif ent.label_ == "ORG":
-                        if ent.text not in entities["organizations"]:
-                            entities["organizations"].append(ent.text)
-                    elif ent.label_ in ["GPE", "LOC"]:
-                        if ent.text not in entities["locations"]:
-                            entities["locations"].append(ent.text)
-                    elif ent.label_ == "DATE":
-                        if ent.text not in entities["dates"]:
-                            entities["dates"].append(ent.text)
-            except Exception as e:
-                print(f"Error processing chunk with spaCy: {str(e)}")
+        for doc in nlp_docs:
+            for ent in doc.ents:
+                if ent.label_ == "PERSON":
+                    entities["people"][ent.text] = None
+                elif ent.label_ == "ORG":
+                    entities["organizations"][ent.text] = None
+                elif ent.label_ in ["GPE", "LOC"]:
+                    entities["locations"][ent.text] = None
+                elif ent.label_ == "DATE":
+                    entities["dates"][ent.text] = None
         
-        return entities
+        return {key: list(values) for key, values in entities.items()}
     
-    def _extract_sections(self, text):
+    def _extract_sections(self, text, pages=None):
         """
         Extract document sections
         
         Args:
             text (str): Document text content
+            pages (list, optional): Text of each page, if already split
             
         Returns:
             dict: Extracted sections
         """
         sections = {}
         
-        # Split by page markers first
-        pages = re.split(r'---\s*Page\s+\d+\s*---', text)
-        
-        # Common section headers in legal documents
-        section_patterns = [
-            (r'(?i)(?:\n|\r|\A)\s*(?:[IVX0-9]+\.)?\s*(?:RECITALS|WITNESSETH)[\s:]*', "recitals"),
-            (r'(?i)(?:\n|\r|\A)\s*(?:[IVX0-9]+\.)?\s*(?:DEFINITIONS|DEFINED TERMS)[\s:]*', "definitions"),
-            (r'(?i)(?:\n|\r|\A)\s*(?:[IVX0-9]+\.)?\s*(?:PROPERTY DESCRIPTION|LEGAL DESCRIPTION)[\s:]*', "property_description"),
-            (r'(?i)(?:\n|\r|\A)\s*(?:[IVX0-9]+\.)?\s*(?:PURCHASE PRICE|CONSIDERATION|PAYMENT)[\s:]*', "payment_terms"),
-            (r'(?i)(?:\n|\r|\A)\s*(?:[IVX0-9]+\.)?\s*(?:REPRESENTATIONS|WARRANTIES)[\s:]*', "representations"),
-            (r'(?i)(?:\n|\r|\A)\s*(?:[IVX0-9]+\.)?\s*(?:COVENANTS)[\s:]*', "covenants"),
-            (r'(?i)(?:\n|\r|\A)\s*(?:[IVX0-9]+\.)?\s*(?:CONDITIONS PRECEDENT|CONDITIONS)[\s:]*', "conditions"),
-            (r'(?i)(?:\n|\r|\A)\s*(?:[IVX0-9]+\.)?\s*(?:TERM|DURATION)[\s:]*', "term"),
-            (r'(?i)(?:\n|\r|\A)\s*(?:[IVX0-9]+\.)?\s*(?:TERMINATION)[\s:]*', "termination"),
-            (r'(?i)(?:\n|\r|\A)\s*(?:[IVX0-9]+\.)?\s*(?:DEFAULT|BREACH)[\s:]*', "default"),
-            (r'(?i)(?:\n|\r|\A)\s*(?:[IVX0-9]+\.)?\s*(?:REMEDIES)[\s:]*', "remedies"),
-            (r'(?i)(?:\n|\r|\A)\s*(?:[IVX0-9]+\.)?\s*(?:GOVERNING LAW|APPLICABLE LAW)[\s:]*', "governing_law"),
-            (r'(?i)(?:\n|\r|\A)\s*(?:[IVX0-9]+\.)?\s*(?:NOTICES)[\s:]*', "notices"),
-            (r'(?i)(?:\n|\r|\A)\s*(?:[IVX0-9]+\.)?\s*(?:MISCELLANEOUS|GENERAL PROVISIONS)[\s:]*', "miscellaneous")
-        ]
+        # Split by page markers first, unless the pages are already known
+        if pages is None:
+            pages = PAGE_RE.split(text)
         
         # Extract sections from each page
         for page in pages:
             if not page.strip():
                 continue
                 
-            for pattern, section_name in section_patterns:
-                section_matches = re.split(pattern, page)
-                if len(section_matches) > 1:
-                    # The section content is after the section header
-                    section_content = section_matches[1].strip()
-                    
-                    # Find the end of the section (next section)
-                    for p, _ in section_patterns:
-                        end_match = re.search(p, section_content)
-                        if end_match:
-                            section_content = section_content[:end_match.start()].strip()
-                    
-                    # Add or append to existing section
-                    if section_name in sections:
-                        sections[section_name] += "\n\n" + section_content
-                    else:
-                        sections[section_name] = section_content
+            # Find every position each section header matches at, over the
+            # lowercased page when its positions match the original
+            header_patterns, header_text = self.section_patterns, page
+            if self.lowered_section_patterns is not None:
+                page_lower = page.lower()
+                if len(page_lower) == len(page):
+                    header_patterns, header_text = self.lowered_section_patterns, page_lower
+            
+            matches = []
+            for i, (pattern, section_name) in enumerate(header_patterns):
+                match = pattern.search(header_text)
+                while match:
+                    matches.append((match.start(), -match.end(), i, section_name))
+                    match = pattern.search(header_text, match.start() + 1)
+            
+            # Where several headers match at a position, the longest wins
+            # (TERMINATION over TERM), then the first in pattern order
+            matches.sort()
+            
+            headers = []
+            header_end = 0
+            for start, end, _, section_name in matches:
+                # Skip positions inside the previous header
+                if start < header_end:
+                    continue
+                end = -end
+                headers.append((start, end, section_name))
+                
+                # Trailing whitespace is part of the header, but can start the next one
+                header_end = start + len(page[start:end].rstrip())
+            
+            # Each section runs from its header to the next one; only the
+            # first section of each kind on a page is kept
+            page_sections = {}
+            for i, (_, end, section_name) in enumerate(headers):
+                next_start = headers[i + 1][0] if i + 1 < len(headers) else len(page)
+                if section_name not in page_sections:
+                    page_sections[section_name] = page[end:next_start].strip()
+            
+            # Collect the parts of each section, to join once at the end
+            for section_name, section_content in page_sections.items():
+                sections.setdefault(section_name, []).append(section_content)
         
-        return sections
+        return {name: "\n\n".join(parts) for name, parts in sections.items()}
     
-    def _extract_parties(self, text):
+    def _extract_parties(self, text, possible=None, text_lower=None):
         """
         Extract parties involved in the agreement
         
         Args:
             text (str): Document text content
+            possible (set, optional): Patterns that may match the text, from the prefilter
+            text_lower (str, optional): The text lowercased, with the same length
             
         Returns:
             dict: Extracted parties
@@ -364,45 +969,15 @@ class DocumentAnalyzer:
             "tenant": None
         }
         
-        # Common party patterns
-        party_patterns = {
-            "buyer": [
-                r"(?i)buyer:?\s*([^,\n\r\.]{3,50})",
-                r"(?i)purchaser:?\s*([^,\n\r\.]{3,50})",
-                r"(?i)HEREINAFTER\s+(?:called|referred to as)[^,\n\r]*\"?(?:buyer|purchaser)\"?[^,\n\r]*,\s*([^,\n\r\.]{3,50})"
-            ],
-            "seller": [
-                r"(?i)seller:?\s*([^,\n\r\.]{3,50})",
-                r"(?i)vendor:?\s*([^,\n\r\.]{3,50})",
-                r"(?i)HEREINAFTER\s+(?:called|referred to as)[^,\n\r]*\"?(?:seller|vendor)\"?[^,\n\r]*,\s*([^,\n\r\.]{3,50})"
-            ],
-            "lender": [
-                r"(?i)lender:?\s*([^,\n\r\.]{3,50})",
-                r"(?i)mortgagee:?\s*([^,\n\r\.]{3,50})",
-                r"(?i)HEREINAFTER\s+(?:called|referred to as)[^,\n\r]*\"?(?:lender|mortgagee)\"?[^,\n\r]*,\s*([^,\n\r\.]{3,50})"
-            ],
-            "borrower": [
-                r"(?i)borrower:?\s*([^,\n\r\.]{3,50})",
-                r"(?i)mortgagor:?\s*([^,\n\r\.]{3,50})",
-                r"(?i)HEREINAFTER\s+(?:called|referred to as)[^,\n\r]*\"?(?:borrower|mortgagor)\"?[^,\n\r]*,\s*([^,\n\r\.]{3,50})"
-            ],
-            "lessor": [
-                r"(?i)lessor:?\s*([^,\n\r\.]{3,50})",
-                r"(?i)landlord:?\s*([^,\n\r\.]{3,50})",
-                r"(?i)HEREINAFTER\s+(?:called|referred to as)[^,\n\r]*\"?(?:lessor|landlord)\"?[^,\n\r]*,\s*([^,\n\r\.]{3,50})"
-            ],
-            "lessee": [
-                r"(?i)lessee:?\s*([^,\n\r\.]{3,50})",
-                r"(?i)tenant:?\s*([^,\n\r\.]{3,50})",
-                r"(?i)HEREINAFTER\s+(?:called|referred to as)[^,\n\r]*\"?(?:lessee|tenant)\"?[^,\n\r]*,\s*([^,\n\r\.]{3,50})"
-            ]
-        }
-        
         # Extract parties
-        for party, patterns in party_patterns.items():
+        for party, patterns in self.party_patterns.items():
             for pattern in patterns:
-                match = re.search(pattern, text)
-                if match and not parties[party]:
+                if parties[party]:
+                    break
+                if possible is not None and pattern.pattern not in possible:
+                    continue
+                match = self._search(pattern, text, text_lower)
+                if match:
                     parties[party] = match.group(1).strip()
         
         # Map redundant fields
@@ -418,12 +993,16 @@ class DocumentAnalyzer:
         
         return parties
     
-    def _extract_dates(self, text):
+    def _extract_dates(self, text, nlp_docs=None, possible=None, text_lower=None, date_entities=None):
         """
         Extract important dates from the document
         
         Args:
             text (str): Document text content
+            nlp_docs (list, optional): Already processed spaCy Docs for the text
+            possible (set, optional): Patterns that may match the text, from the prefilter
+            text_lower (str, optional): The text lowercased, with the same length
+            date_entities (list, optional): DATE entities already found by _extract_entities
             
         Returns:
             dict: Extracted dates
@@ -436,70 +1015,48 @@ class DocumentAnalyzer:
             "other_dates": []
         }
         
-        # Date patterns
-        date_patterns = {
-            "agreement_date": [
-                r"(?i)(?:THIS\s+AGREEMENT|THIS\s+CONTRACT)[^.]*?dated\s+(?:as of\s+)?([A-Za-z]+\s+\d{1,2}(?:st|nd|rd|th)?,?\s+\d{4})",
-                r"(?i)(?:THIS\s+AGREEMENT|THIS\s+CONTRACT)[^.]*?dated\s+(?:as of\s+)?(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})",
-                r"(?i)DATED:?\s*([A-Za-z]+\s+\d{1,2}(?:st|nd|rd|th)?,?\s+\d{4})",
-                r"(?i)DATED:?\s*(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})",
-                r"(?i)dated\s+(?:as of\s+)?(?:the\s+)?(\d{1,2}(?:st|nd|rd|th)?\s+day\s+of\s+[A-Za-z]+,?\s+\d{4})"
-            ],
-            "effective_date": [
-                r"(?i)effective\s+(?:date|as of)(?:\s+the)?\s+(?:date\s+of\s+)?([A-Za-z]+\s+\d{1,2}(?:st|nd|rd|th)?,?\s+\d{4})",
-                r"(?i)effective\s+(?:date|as of)(?:\s+the)?\s+(?:date\s+of\s+)?(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})",
-                r"(?i)effective\s+(?:date|as of)(?:\s+the)?\s+(?:date\s+of\s+)?(?:the\s+)?(\d{1,2}(?:st|nd|rd|th)?\s+day\s+of\s+[A-Za-z]+,?\s+\d{4})"
-            ],
-            "closing_date": [
-                r"(?i)closing\s+date:?\s*([A-Za-z]+\s+\d{1,2}(?:st|nd|rd|th)?,?\s+\d{4})",
-                r"(?i)closing\s+date:?\s*(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})",
-                r"(?i)date\s+of\s+closing:?\s*([A-Za-z]+\s+\d{1,2}(?:st|nd|rd|th)?,?\s+\d{4})",
-                r"(?i)date\s+of\s+closing:?\s*(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})"
-            ],
-            "execution_date": [
-                r"(?i)executed\s+(?:on|as of)(?:\s+the)?\s+(?:date\s+of\s+)?([A-Za-z]+\s+\d{1,2}(?:st|nd|rd|th)?,?\s+\d{4})",
-                r"(?i)executed\s+(?:on|as of)(?:\s+the)?\s+(?:date\s+of\s+)?(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})",
-                r"(?i)executed\s+(?:on|as of)(?:\s+the)?\s+(?:date\s+of\s+)?(?:the\s+)?(\d{1,2}(?:st|nd|rd|th)?\s+day\s+of\s+[A-Za-z]+,?\s+\d{4})"
-            ]
-        }
-        
         # Extract specific dates
-        for date_type, patterns in date_patterns.items():
+        for date_type, patterns in self.date_patterns.items():
             for pattern in patterns:
-                match = re.search(pattern, text)
-                if match and not dates[date_type]:
+                if dates[date_type]:
+                    break
+                if possible is not None and pattern.pattern not in possible:
+                    continue
+                match = self._search(pattern, text, text_lower)
+                if match:
                     dates[date_type] = match.group(1).strip()
         
         # Extract all dates using spaCy
         if self.nlp:
             try:
-                # Process in chunks
-                chunk_size = 5000
-                chunks = [text[i:i+chunk_size] for i in range(0, len(text), chunk_size)]
+                if date_entities is None:
+                    if nlp_docs is None:
+                        nlp_docs = self._process_chunks(text)
+                    date_entities = [ent.text for doc in nlp_docs for ent in doc.ents if ent.label_ == "DATE"]
                 
-                all_dates = []
-                for chunk in chunks:
-                    doc = self.nlp(chunk)
-                    for ent in doc.ents:
-                        if ent.label_ == "DATE":
-                            date_text = ent.text.strip()
-                            # Filter out common non-specific dates
-                            if not re.match(r"(?i)(today|now|current|present|annually|monthly|yearly|daily)", date_text):
-                                all_dates.append(date_text)
+                all_dates = {}
+                for date_text in date_entities:
+                    date_text = date_text.strip()
+                    # Filter out common non-specific dates
+                    if not date_text.lower().startswith(DATE_STOPWORDS):
+                        all_dates[date_text] = None
                 
                 # Add unique dates not already captured
-                dates["other_dates"] = list(set([d for d in all_dates if d not in dates.values()]))
+                captured = {d for d in dates.values() if isinstance(d, str)}
+                dates["other_dates"] = [d for d in all_dates if d not in captured]
             except Exception as e:
-                print(f"Error extracting dates with spaCy: {str(e)}")
+                logger.error(f"Error extracting dates with spaCy: {str(e)}")
         
         return dates
     
-    def _extract_monetary_amounts(self, text):
+    def _extract_monetary_amounts(self, text, possible=None, text_lower=None):
         """
         Extract monetary amounts from the document
         
         Args:
             text (str): Document text content
+            possible (set, optional): Patterns that may match the text, from the prefilter
+            text_lower (str, optional): The text lowercased, with the same length
             
         Returns:
             dict: Extracted monetary amounts
@@ -513,49 +1070,15 @@ class DocumentAnalyzer:
             "other_amounts": []
         }
         
-        # Money patterns
-        money_patterns = {
-            "purchase_price": [
-                r"(?i)purchase\s+price:?\s*\$?([0-9,]+\.[0-9]{2})",
-                r"(?i)purchase\s+price:?\s*\$?([0-9,]+)",
-                r"(?i)total\s+consideration:?\s*\$?([0-9,]+\.[0-9]{2})",
-                r"(?i)total\s+consideration:?\s*\$?([0-9,]+)",
-                r"(?i)sales\s+price:?\s*\$?([0-9,]+\.[0-9]{2})",
-                r"(?i)sales\s+price:?\s*\$?([0-9,]+)"
-            ],
-            "loan_amount": [
-                r"(?i)loan\s+amount:?\s*\$?([0-9,]+\.[0-9]{2})",
-                r"(?i)loan\s+amount:?\s*\$?([0-9,]+)",
-                r"(?i)principal\s+(?:sum|amount):?\s*\$?([0-9,]+\.[0-9]{2})",
-                r"(?i)principal\s+(?:sum|amount):?\s*\$?([0-9,]+)",
-                r"(?i)mortgage\s+amount:?\s*\$?([0-9,]+\.[0-9]{2})",
-                r"(?i)mortgage\s+amount:?\s*\$?([0-9,]+)"
-            ],
-            "deposit_amount": [
-                r"(?i)deposit:?\s*\$?([0-9,]+\.[0-9]{2})",
-                r"(?i)deposit:?\s*\$?([0-9,]+)",
-                r"(?i)earnest\s+money:?\s*\$?([0-9,]+\.[0-9]{2})",
-                r"(?i)earnest\s+money:?\s*\$?([0-9,]+)"
-            ],
-            "monthly_payment": [
-                r"(?i)monthly\s+payment:?\s*\$?([0-9,]+\.[0-9]{2})",
-                r"(?i)monthly\s+payment:?\s*\$?([0-9,]+)",
-                r"(?i)monthly\s+rent:?\s*\$?([0-9,]+\.[0-9]{2})",
-                r"(?i)monthly\s+rent:?\s*\$?([0-9,]+)"
-            ],
-            "interest_rate": [
-                r"(?i)interest\s+rate:?\s*([0-9\.]+)%",
-                r"(?i)interest\s+rate:?\s*([0-9\.]+)\s+percent",
-                r"(?i)at\s+(?:the\s+)?(?:annual\s+)?(?:rate\s+)?(?:of\s+)?([0-9\.]+)%\s+(?:interest|per\s+annum)",
-                r"(?i)at\s+(?:the\s+)?(?:annual\s+)?(?:rate\s+)?(?:of\s+)?([0-9\.]+)\s+percent\s+(?:interest|per\s+annum)"
-            ]
-        }
-        
         # Extract specific monetary amounts
-        for money_type, patterns in money_patterns.items():
+        for money_type, patterns in self.money_patterns.items():
             for pattern in patterns:
-                match = re.search(pattern, text)
-                if match and not monetary[money_type]:
+                if monetary[money_type]:
+                    break
+                if possible is not None and pattern.pattern not in possible:
+                    continue
+                match = self._search(pattern, text, text_lower)
+                if match:
                     value = match.group(1).strip()
                     # Remove commas from numbers
                     value = value.replace(',', '')
@@ -568,32 +1091,31 @@ class DocumentAnalyzer:
         
         # Extract all monetary amounts using regex
         all_money_pattern = r'\$([0-9,]+(?:\.[0-9]{2})?)'
-        all_money_matches = re.findall(all_money_pattern, text)
+        all_money_matches = _rx(all_money_pattern).findall(text)
         
         # Remove commas and convert to float for sorting
+        captured = {v for v in monetary.values() if isinstance(v, str)}
         all_money = []
         for m in all_money_matches:
-            try:
-                amount = float(m.replace(',', ''))
-                formatted = f"${m}"
-                # Only add if not already in specific categories
-                if formatted not in monetary.values():
-                    all_money.append((amount, formatted))
-            except ValueError:
-                pass
+            amount = parse_amount(m)
+            formatted = f"${m}"
+            # Only add if not already in specific categories
+            if amount is not None and formatted not in captured:
+                all_money.append((amount, formatted))
                 
-        # Sort by amount (descending) and take top 5
-        all_money.sort(reverse=True)
-        monetary["other_amounts"] = [m[1] for m in all_money[:5]]
+        # Take the top 5 by amount (descending) without sorting them all
+        monetary["other_amounts"] = [m[1] for m in heapq.nlargest(5, all_money)]
         
         return monetary
     
-    def _extract_property_info(self, text):
+    def _extract_property_info(self, text, possible=None, text_lower=None):
         """
         Extract property information from the document
         
         Args:
             text (str): Document text content
+            possible (set, optional): Patterns that may match the text, from the prefilter
+            text_lower (str, optional): The text lowercased, with the same length
             
         Returns:
             dict: Extracted property information
@@ -606,36 +1128,15 @@ class DocumentAnalyzer:
             "square_footage": None
         }
         
-        # Property patterns
-        property_patterns = {
-            "address": [
-                r"(?i)property\s+address:?\s*([^,\n\r\.]{3,100}(?:,\s*[^,\n\r\.]{3,50}){1,3})",
-                r"(?i)real\s+property\s+located\s+at:?\s*([^,\n\r\.]{3,100}(?:,\s*[^,\n\r\.]{3,50}){1,3})",
-                r"(?i)premises\s+located\s+at:?\s*([^,\n\r\.]{3,100}(?:,\s*[^,\n\r\.]{3,50}){1,3})",
-                r"(?i)property\s+commonly\s+known\s+as:?\s*([^,\n\r\.]{3,100}(?:,\s*[^,\n\r\.]{3,50}){1,3})"
-            ],
-            "legal_description": [
-                r"(?i)legal\s+description:?\s*\n*((?:[^\n\r]{3,200}\n*){1,10})"
-            ],
-            "property_type": [
-                r"(?i)property\s+type:?\s*([^,\n\r\.]{3,50})",
-                r"(?i)type\s+of\s+property:?\s*([^,\n\r\.]{3,50})"
-            ],
-            "parcel_number": [
-                r"(?i)(?:parcel|tax|assessor(?:'s)?)\s+(?:id|identification|number):?\s*([^,\n\r\.]{3,50})",
-                r"(?i)APN:?\s*([^,\n\r\.]{3,50})"
-            ],
-            "square_footage": [
-                r"(?i)(?:square\s+feet|sq\.\s*ft\.|sf):?\s*([0-9,]+)",
-                r"(?i)(?:approximately|approx\.)\s+([0-9,]+)\s+(?:square\s+feet|sq\.\s*ft\.|sf)"
-            ]
-        }
-        
         # Extract property information
-        for prop_type, patterns in property_patterns.items():
+        for prop_type, patterns in self.property_patterns.items():
             for pattern in patterns:
-                match = re.search(pattern, text)
-                if match and not property_info[prop_type]:
+                if property_info[prop_type]:
+                    break
+                if possible is not None and pattern.pattern not in possible:
+                    continue
+                match = self._search(pattern, text, text_lower)
+                if match:
                     property_info[prop_type] = match.group(1).strip()
         
         return property_info 
\ No newline at end of file
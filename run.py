@@ -30,35 +30,26 @@ if not os.path.exists(config_file):
     config.save_config(config_file)
     print(f"Created default configuration file: {config_file}")
 
-# Check for required NLP models
+# Check for the NLP models and resources, unless they were downloaded when
+# the environment was built (see scripts/prefetch_assets.py)
+if not os.getenv('CIS_ASSETS_READY'):
+    from scripts.prefetch_assets import prefetch_assets
+    prefetch_assets()
+
+# Load the spaCy model now so the analyzer (and any forked server workers)
+# reuse it instead of loading their own. The model and its excluded
+# components come from the same configuration the analyzer reads, so the
+# preloaded model is the one it asks for
 try:
-    import spacy
-    spacy_model = os.getenv('SPACY_MODEL', 'en_core_web_sm')
-    try:
-        nlp = spacy.load(spacy_model)
-        print(f"Loaded spaCy model: {spacy_model}")
-    except OSError:
-        print(f"Downloading spaCy model: {spacy_model}")
-        spacy.cli.download(spacy_model)
-        print(f"Downloaded spaCy model: {spacy_model}")
+    from processors.nlp.document_analyzer import BLANK_MODEL_PREFIX, DocumentAnalyzer, get_nlp
+    from utils.config_loader import ConfigLoader
+    nlp_config = ConfigLoader.shared(config_file).get_nlp_config()
+    spacy_model = nlp_config['spacy_model']
+    if nlp_config.get('use_spacy', True) and not spacy_model.startswith(BLANK_MODEL_PREFIX):
+        get_nlp(spacy_model, tuple(nlp_config.get('disabled_pipes', DocumentAnalyzer.UNUSED_PIPES)))
 except ImportError:
     print("Warning: spaCy not installed. NLP features will not work.")
 
-# Check for NLTK resources
-try:
-    import nltk
-    nltk_resources = ['punkt', 'stopwords', 'wordnet']
-    for resource in nltk_resources:
-        try:
-            nltk.data.find(f'tokenizers/{resource}' if resource == 'punkt' else f'corpora/{resource}')
-            print(f"Found NLTK resource: {resource}")
-        except LookupError:
-            print(f"Downloading NLTK resource: {resource}")
-            nltk.download(resource)
-            print(f"Downloaded NLTK resource: {resource}")
-except ImportError:
-    print("Warning: NLTK not installed. Some NLP features may not work.")
-
 # Run the application
 if __name__ == "__main__":
     from app import app
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Download the NLP models and resources used by CIS-Generator
+
+Run this once when building the environment (e.g. in a Docker image), then set
+CIS_ASSETS_READY=1 so that run.py doesn't check for them on every start.
+"""
+
+import os
+from dotenv import load_dotenv
+
+# NLTK resources, with the paths they are found under
+NLTK_RESOURCES = {
+    'punkt': 'tokenizers/punkt',
+    'stopwords': 'corpora/stopwords',
+    'wordnet': 'corpora/wordnet'
+}
+
+def prefetch_spacy_model(model_name):
+    """
+    Download a spaCy model if it isn't installed
+    
+    Args:
+        model_name (str): Name of the spaCy model
+    """
+    try:
+        import spacy
+    except ImportError:
+        print("Warning: spaCy not installed. NLP features will not work.")
+        return
+    
+    # Blank pipelines are built from spaCy itself, there's nothing to download
+    if model_name.startswith('blank:'):
+        return
+    
+    if spacy.util.is_package(model_name):
+        print(f"Found spaCy model: {model_name}")
+    else:
+        print(f"Downloading spaCy model: {model_name}")
+        spacy.cli.download(model_name)
+
+def prefetch_nltk_resources():
+    """
+    Download the NLTK resources that aren't installed
+    """
+    try:
+        import nltk
+    except ImportError:
+        print("Warning: NLTK not installed. Some NLP features may not work.")
+        return
+    
+    for resource, path in NLTK_RESOURCES.items():
+        try:
+            nltk.data.find(path)
+            print(f"Found NLTK resource: {resource}")
+        except LookupError:
+            print(f"Downloading NLTK resource: {resource}")
+            nltk.download(resource)
+            print(f"Downloaded NLTK resource: {resource}")
+
+def prefetch_assets():
+    """
+    Download all NLP models and resources that aren't installed
+    """
+    prefetch_spacy_model(os.getenv('SPACY_MODEL', 'en_core_web_sm'))
+    prefetch_nltk_resources()
+
+if __name__ == "__main__":
+    load_dotenv()
+    prefetch_assets()
@@ -0,0 +1,46 @@
+"""
+Celery tasks for CIS-Generator
+
+Start a worker with:
+    celery -A tasks worker
+"""
+
+import os
+from celery import Celery
+from celery.signals import worker_process_init
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+celery = Celery(
+    'cis_generator',
+    broker=os.getenv('CELERY_BROKER_URL', 'redis://localhost:6379/0'),
+    backend=os.getenv('CELERY_RESULT_BACKEND')
+)
+
+@worker_process_init.connect
+def init_worker(**kwargs):
+    """
+    Load the processing components once per worker process
+    """
+    from app import init_components
+    init_components()
+
+@celery.task
+def process_job(job_id, template_path, doc_paths, doc_filenames):
+    """
+    Process the documents of an upload job
+    
+    Args:
+        job_id (str): The job identifier
+        template_path (str): Path to the saved template file
+        doc_paths (list): Paths to the saved PDF documents
+        doc_filenames (list): Sanitized names of the documents
+        
+    Returns:
+        str: The job identifier
+    """
+    from app import run_job
+    run_job(job_id, template_path, doc_paths, doc_filenames)
+    return job_id
@@ -3,9 +3,8 @@
 Test script for document extraction functionality
 """
 
-import os
+import io
 import sys
-import json
 from pathlib import Path
 
 # Add parent directory to path
@@ -15,39 +14,49 @@ from processors.extractors.pdf_extractor import PDFExtractor
 from processors.nlp.document_analyzer import DocumentAnalyzer
 from utils.config_loader import ConfigLoader
 from models.document import Document
+from utils import json_utils
 
 def test_pdf_extraction(pdf_path):
     """Test PDF text extraction"""
-    print(f"\n=== Testing PDF Extraction on {pdf_path} ===")
+    # Collect the report and write it out in one go
+    out = io.StringIO()
+    print(f"\n=== Testing PDF Extraction on {pdf_path} ===", file=out)
     
     extractor = PDFExtractor()
     
     try:
-        # Extract text
-        text = extractor.extract_text(pdf_path)
-        print(f"Extracted {len(text)} characters of text")
-        
-        # Print a sample
-        sample_size = min(500, len(text))
-        print(f"\nSample of extracted text ({sample_size} chars):")
-        print("-" * 80)
-        print(text[:sample_size] + "...")
-        print("-" * 80)
-        
-        # Extract metadata
-        metadata = extractor.extract_metadata(pdf_path)
-        print("\nMetadata:")
-        for key, value in metadata.items():
-            print(f"  {key}: {value}")
+        # Open the PDF once for all three extraction steps
+        with extractor.open(pdf_path) as pdf:
+            # Extract text, across several processes for long documents
+            text = extractor.extract_text_parallel(pdf)
+            print(f"Extracted {len(text)} characters of text", file=out)
+            
+            # Print a sample
+            sample_size = min(500, len(text))
+            print(f"\nSample of extracted text ({sample_size} chars):", file=out)
+            print("-" * 80, file=out)
+            out.write(text[:sample_size])
+            out.write("...\n")
+            print("-" * 80, file=out)
             
-        # Extract tables
-        tables = extractor.extract_tables(pdf_path)
-        print(f"\nExtracted {len(tables)} tables")
+            # Extract metadata
+            metadata = extractor.extract_metadata(pdf)
+            print("\nMetadata:", file=out)
+            for key, value in metadata.items():
+                print(f"  {key}: {value}", file=out)
+                
+            # Extract tables
+            tables = extractor.extract_tables(pdf)
+            print(f"\nExtracted {len(tables)} tables", file=out)
         
         return text
+    except FileNotFoundError:
+        raise
     except Exception as e:
-        print(f"Error during extraction: {str(e)}")
+        print(f"Error during extraction: {str(e)}", file=out)
         return None
+    finally:
+        sys.stdout.write(out.getvalue())
 
 def test_document_analysis(text):
     """Test document analysis with NLP"""
@@ -55,63 +64,68 @@ def test_document_analysis(text):
         print("No text to analyze")
         return None
         
-    print("\n=== Testing Document Analysis ===")
+    # Collect the report and write it out in one go
+    out = io.StringIO()
+    print("\n=== Testing Document Analysis ===", file=out)
     
     # Load configuration
-    config = ConfigLoader()
+    config = ConfigLoader.shared()
     
     # Create document
     document = Document()
     document.set_content(text)
     
     # Create analyzer
-    analyzer = DocumentAnalyzer(config.get_nlp_config())
+    nlp_config = config.get_nlp_config()
+    nlp_config['compiled_patterns'] = config.get_compiled_patterns()
+    analyzer = DocumentAnalyzer(nlp_config)
     
     try:
         # Analyze document
         extracted_data = analyzer.analyze(document)
         
         # Print document type
-        print(f"Document Type: {extracted_data.get('document_type', 'Unknown')}")
+        print(f"Document Type: {extracted_data.get('document_type', 'Unknown')}", file=out)
         
         # Print property information
         property_info = extracted_data.get('property', {})
-        print("\nProperty Information:")
+        print("\nProperty Information:", file=out)
         for key, value in property_info.items():
             if value:
-                print(f"  {key}: {value}")
+                print(f"  {key}: {value}", file=out)
                 
         # Print parties
         parties = extracted_data.get('parties', {})
-        print("\nParties:")
+        print("\nParties:", file=out)
         for key, value in parties.items():
             if value:
-                print(f"  {key}: {value}")
+                print(f"  {key}: {value}", file=out)
                 
         # Print monetary values
         monetary = extracted_data.get('monetary_values', {})
-        print("\nMonetary Values:")
+        print("\nMonetary Values:", file=out)
         for key, value in monetary.items():
             if value and key != 'other_amounts':
-                print(f"  {key}: {value}")
+                print(f"  {key}: {value}", file=out)
                 
         # Print dates
         dates = extracted_data.get('dates', {})
-        print("\nDates:")
+        print("\nDates:", file=out)
         for key, value in dates.items():
             if value and key != 'other_dates':
-                print(f"  {key}: {value}")
+                print(f"  {key}: {value}", file=out)
                 
         # Save extraction results
         output_file = "test_extraction_results.json"
-        with open(output_file, 'w') as f:
-            json.dump(extracted_data, f, indent=4)
-        print(f"\nSaved extraction results to {output_file}")
+        json_utils.dump_file(extracted_data, output_file)
+        print(f"\nSaved extraction results to {output_file}", file=out)
         
         return extracted_data
     except Exception as e:
-        print(f"Error during analysis: {str(e)}")
+        print(f"Error during analysis: {str(e)}", file=out)
         return None
+    finally:
+        sys.stdout.write(out.getvalue())
 
 def main():
     """Main function"""
@@ -122,13 +136,12 @@ def main():
         
     pdf_path = sys.argv[1]
     
-    # Check if file exists
-    if not os.path.exists(pdf_path):
+    # Test PDF extraction; a missing file is reported when it is opened
+    try:
+        text = test_pdf_extraction(pdf_path)
+    except FileNotFoundError:
         print(f"File not found: {pdf_path}")
         return
-        
-    # Test PDF extraction
-    text = test_pdf_extraction(pdf_path)
     
     # Test document analysis
     if text:
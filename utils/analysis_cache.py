@@ -0,0 +1,131 @@
+import logging
+import os
+import hashlib
+
+from utils import json_utils
+
+logger = logging.getLogger(__name__)
+
+class AnalysisCache:
+    """
+    Disk cache for document analysis results, keyed by a hash of the document content
+    
+    Once the cache holds more than max_entries results, the least recently
+    used ones are removed when a new result is stored.
+    """
+    
+    def __init__(self, cache_dir, salt='', max_entries=10000):
+        """
+        Initialize the analysis cache
+        
+        Args:
+            cache_dir (str): Directory to store cached results in
+            salt (str, optional): Extra data mixed into every key, e.g. a
+                                  fingerprint of the analyzer configuration so
+                                  that changing it invalidates old results
+            max_entries (int, optional): Most results to keep, None for no limit
+        """
+        self.cache_dir = cache_dir
+        self.salt = salt.encode('utf-8')
+        self.max_entries = max_entries
+        os.makedirs(cache_dir, exist_ok=True)
+    
+    def hash_file(self, file_path, chunk_size=1024 * 1024):
+        """
+        Compute the cache key for a file from its contents
+        
+        Args:
+            file_path (str): Path to the file
+            chunk_size (int): Number of bytes to read at a time
+            
+        Returns:
+            str: The cache key
+        """
+        digest = hashlib.sha256(self.salt)
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+    
+    def _cache_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+    
+    def get(self, key):
+        """
+        Get cached analysis results
+        
+        Args:
+            key (str): The cache key
+            
+        Returns:
+            dict: The cached results, or None if not cached
+        """
+        cache_path = self._cache_path(key)
+        if not os.path.exists(cache_path):
+            return None
+            
+        try:
+            data = json_utils.load_file(cache_path)
+        except Exception as e:
+            logger.error(f"Error reading cached analysis {key}: {str(e)}")
+            return None
+        
+        # Mark the result as recently used, so pruning keeps it
+        try:
+            os.utime(cache_path)
+        except OSError:
+            pass
+        return data
+    
+    def set(self, key, data):
+        """
+        Store analysis results in the cache
+        
+        Args:
+            key (str): The cache key
+            data (dict): The analysis results
+        """
+        cache_path = self._cache_path(key)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        
+        try:
+            json_utils.dump_file(data, tmp_path, indent=False)
+            # Atomic rename so concurrent workers never read a partial file
+            os.replace(tmp_path, cache_path)
+        except Exception as e:
+            logger.error(f"Error caching analysis {key}: {str(e)}")
+            return
+        
+        self.prune()
+    
+    def prune(self):
+        """
+        Remove the least recently used results while the cache holds too many
+        
+        Pruning goes down to 90% of max_entries, so a full cache isn't
+        pruned again for every new result.
+        """
+        if self.max_entries is None:
+            return
+        
+        try:
+            entries = [entry for entry in os.scandir(self.cache_dir) if entry.name.endswith('.json')]
+        except OSError as e:
+            logger.error(f"Error listing cached analyses: {str(e)}")
+            return
+        if len(entries) <= self.max_entries:
+            return
+        
+        def mtime(entry):
+            try:
+                return entry.stat().st_mtime
+            except OSError:
+                return 0
+        
+        entries.sort(key=mtime)
+        for entry in entries[:len(entries) - self.max_entries * 9 // 10]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                # Already removed by another worker
+                pass
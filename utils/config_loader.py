@@ -1,20 +1,105 @@
+import logging
 import os
-import json
+import re
+import copy
+from functools import cached_property, lru_cache
+
+from utils import json_utils
+from utils.pattern_utils import SCOPED_FLAGS, pattern_flags
+
+try:
+    import re2
+except ImportError:
+    re2 = None
+
+logger = logging.getLogger(__name__)
+
+# Regex engines the extraction patterns can be compiled with; 'auto' uses
+# RE2 when it is installed
+REGEX_ENGINES = ('auto', 're', 're2')
+
+# Regex flags of the default extraction patterns, as a plain int so the
+# configuration serializes to JSON as a number
+DEFAULT_PATTERN_FLAGS = int(re.IGNORECASE | re.MULTILINE)
+
+# Configuration used when no configuration file is loaded
+_DEFAULT_CONFIG = {
+    "extraction_patterns": {
+        "property_address": {
+            "pattern": r"(?i)property\s+address:?\s*([^,\n\r\.]{3,100}(?:,\s*[^,\n\r\.]{3,50}){1,3})",
+            "flags": DEFAULT_PATTERN_FLAGS
+        },
+        "purchase_price": {
+            "pattern": r"(?i)purchase\s+price:?\s*\$?([0-9,]+(?:\.[0-9]{2})?)",
+            "flags": DEFAULT_PATTERN_FLAGS
+        },
+        "closing_date": {
+            "pattern": r"(?i)closing\s+date:?\s*([A-Za-z]+\s+\d{1,2}(?:st|nd|rd|th)?,?\s+\d{4}|(?:\d{1,2}[/-]){2}\d{2,4})",
+            "flags": DEFAULT_PATTERN_FLAGS
+        }
+    },
+    "entity_rules": {
+        "people": ["PERSON"],
+        "organizations": ["ORG"],
+        "locations": ["GPE", "LOC"],
+        "dates": ["DATE"]
+    },
+    "spacy_model": "en_core_web_sm",
+    "field_formats": {
+        "purchase_price": {
+            "type": "currency",
+            "symbol": "$"
+        },
+        "loan_amount": {
+            "type": "currency",
+            "symbol": "$"
+        },
+        "closing_date": {
+            "type": "date",
+            "format": "%B %d, %Y"
+        },
+        "interest_rate": {
+            "type": "percentage",
+            "decimal_places": 3
+        }
+    },
+    "default_values": {
+        "property_address": "N/A",
+        "purchase_price": "$0.00",
+        "closing_date": "",
+        "buyer_name": "N/A",
+        "seller_name": "N/A"
+    }
+}
 
 class ConfigLoader:
     """
     Utility class for loading and managing configuration files
     """
     
-    def __init__(self, config_path=None):
+    def __init__(self, config_path=None, engine='re'):
         """
         Initialize the config loader
         
         Args:
             config_path (str, optional): Path to the configuration file
+            engine (str): Regex engine for the extraction patterns: 're', 're2'
+                          (linear time matching, needs the google-re2 package)
+                          or 'auto'
         """
+        if engine not in REGEX_ENGINES:
+            raise ValueError(f"Unknown regex engine: {engine}")
+        if engine == 're2' and re2 is None:
+            print("Warning: re2 not installed, using re for extraction patterns")
+        
         self.config_path = config_path
         self.config = {}
+        self._shared_config = False
+        self._shared_loader = False
+        self.use_re2 = engine != 're' and re2 is not None
+        # Compiled extraction patterns, kept out of the config so it stays
+        # JSON serializable
+        self.compiled_patterns = {}
         
         if config_path and os.path.exists(config_path):
             self.load_config()
@@ -22,6 +107,34 @@ class ConfigLoader:
             # Load default configuration
             self.load_default_config()
     
+    @classmethod
+    @lru_cache(maxsize=4)
+    def shared(cls, config_path=None, engine='re'):
+        """
+        Get a config loader shared by every caller in the process
+        
+        Its configuration, compiled patterns and NLP config are only built
+        once. Its getters return copies and it can't be reloaded or updated.
+        
+        Args:
+            config_path (str, optional): Path to the configuration file
+            engine (str): Regex engine for the extraction patterns
+            
+        Returns:
+            ConfigLoader: The shared config loader
+        """
+        loader = cls(config_path, engine)
+        loader._shared_config = True
+        loader._shared_loader = True
+        return loader
+    
+    def _check_not_shared(self):
+        """
+        Refuse to change the loader returned by shared()
+        """
+        if self._shared_loader:
+            raise RuntimeError("The shared config loader can't be changed, create a ConfigLoader instead")
+    
     def load_config(self):
         """
         Load configuration from file
@@ -29,12 +142,15 @@ class ConfigLoader:
         Returns:
             dict: The loaded configuration
         """
+        self._check_not_shared()
         try:
-            with open(self.config_path, 'r') as f:
-                self.config = json.load(f)
+            self.config = json_utils.load_file(self.config_path)
+            self._shared_config = False
+            self.__dict__.pop('nlp_config', None)
+            self._compile_patterns()
             print(f"Loaded configuration from {self.config_path}")
         except Exception as e:
-            print(f"Error loading configuration: {str(e)}")
+            logger.error(f"Error loading configuration: {str(e)}")
             # Load default configuration as fallback
             self.load_default_config()
             
@@ -47,69 +163,80 @@ class ConfigLoader:
         Returns:
             dict: The default configuration
         """
-        self.config = {
-            "extraction_patterns": {
-                "property_address": {
-                    "pattern": r"(?i)property\s+address:?\s*([^,\n\r\.]{3,100}(?:,\s*[^,\n\r\.]{3,50}){1,3})",
-                    "case_insensitive": True,
-                    "multiline": True
-                },
-                "purchase_price": {
-                    "pattern": r"(?i)purchase\s+price:?\s*\$?([0-9,]+(?:\.[0-9]{2})?)",
-                    "case_insensitive": True,
-                    "multiline": True
-                },
-                "closing_date": {
-                    "pattern": r"(?i)closing\s+date:?\s*([A-Za-z]+\s+\d{1,2}(?:st|nd|rd|th)?,?\s+\d{4}|(?:\d{1,2}[/-]){2}\d{2,4})",
-                    "case_insensitive": True,
-                    "multiline": True
-                }
-            },
-            "entity_rules": {
-                "people": ["PERSON"],
-                "organizations": ["ORG"],
-                "locations": ["GPE", "LOC"],
-                "dates": ["DATE"]
-            },
-            "spacy_model": "en_core_web_sm",
-            "field_formats": {
-                "purchase_price": {
-                    "type": "currency",
-                    "symbol": "$"
-                },
-                "loan_amount": {
-                    "type": "currency",
-                    "symbol": "$"
-                },
-                "closing_date": {
-                    "type": "date",
-                    "format": "%B %d, %Y"
-                },
-                "interest_rate": {
-                    "type": "percentage",
-                    "decimal_places": 3
-                }
-            },
-            "default_values": {
-                "property_address": "N/A",
-                "purchase_price": "$0.00",
-                "closing_date": "",
-                "buyer_name": "N/A",
-                "seller_name": "N/A"
-            }
-        }
-        
+        self._check_not_shared()
+        # Shared until the configuration is updated (see update_config)
+        self.config = _DEFAULT_CONFIG
+        self._shared_config = True
+        self.__dict__.pop('nlp_config', None)
+        self._compile_patterns()
         print("Loaded default configuration")
         return self.config
     
+    def _compile_patterns(self):
+        """
+        Compile the extraction patterns
+        
+        Returns:
+            dict: Compiled patterns by field
+        """
+        compiled = {}
+        
+        for field, pattern_info in self.get_extraction_patterns().items():
+            try:
+                if isinstance(pattern_info, str):
+                    # Simple pattern string
+                    compiled[field] = self._compile_pattern(pattern_info, re.IGNORECASE | re.MULTILINE)
+                elif isinstance(pattern_info, dict):
+                    # Pattern with options
+                    compiled[field] = self._compile_pattern(pattern_info.get('pattern', ''), pattern_flags(pattern_info))
+            except re.error as e:
+                logger.error(f"Error compiling pattern for '{field}': {str(e)}")
+        
+        self.compiled_patterns = compiled
+        return compiled
+    
+    def _compile_pattern(self, pattern, flags):
+        """
+        Compile an extraction pattern with the configured regex engine
+        
+        Args:
+            pattern (str): Regex pattern
+            flags (int): Regex flags
+            
+        Returns:
+            Compiled pattern
+        """
+        if self.use_re2:
+            # RE2 takes the flags inline. Patterns it doesn't support, such as
+            # ones with backreferences or lookarounds, fall back to re
+            letters = ''.join(letter for flag, letter in SCOPED_FLAGS if flags & flag)
+            try:
+                return re2.compile(f"(?{letters}){pattern}" if letters else pattern)
+            except re2.error:
+                pass
+        return re.compile(pattern, flags)
+    
+    def _copy_if_shared(self, value):
+        """
+        Copy a part of the configuration handed to callers while it is shared
+        with other loaders, so changing it can't change theirs
+        
+        Args:
+            value: Part of the configuration
+            
+        Returns:
+            The value, or a deep copy of it if the configuration is shared
+        """
+        return copy.deepcopy(value) if self._shared_config else value
+    
     def get_config(self):
         """
         Get the full configuration
         
         Returns:
-            dict: The configuration dictionary
+            dict: The configuration dictionary (change it with update_config)
         """
-        return self.config
+        return self._copy_if_shared(self.config)
     
     def get_extraction_patterns(self):
         """
@@ -118,7 +245,18 @@ class ConfigLoader:
         Returns:
             dict: Extraction patterns
         """
-        return self.config.get('extraction_patterns', {})
+        return self._copy_if_shared(self.config.get('extraction_patterns', {}))
+    
+    def get_compiled_patterns(self):
+        """
+        Get the compiled extraction patterns
+        
+        Returns:
+            dict: Compiled patterns by field
+        """
+        if self._shared_loader:
+            return dict(self.compiled_patterns)
+        return self.compiled_patterns
     
     def get_entity_rules(self):
         """
@@ -127,20 +265,42 @@ class ConfigLoader:
         Returns:
             dict: Entity rules
         """
-        return self.config.get('entity_rules', {})
+        return self._copy_if_shared(self.config.get('entity_rules', {}))
     
     def get_nlp_config(self):
         """
         Get NLP configuration
         
+        Returns:
+            dict: NLP configuration (a copy the caller can add settings to)
+        """
+        if self._shared_config:
+            return copy.deepcopy(self.nlp_config)
+        return dict(self.nlp_config)
+    
+    @cached_property
+    def nlp_config(self):
+        """
+        NLP configuration, assembled once per loaded configuration
+        
         Returns:
             dict: NLP configuration
         """
-        return {
+        nlp_config = {
             'spacy_model': self.config.get('spacy_model', 'en_core_web_sm'),
+            'use_spacy': self.config.get('use_spacy', True),
             'extraction_patterns': self.get_extraction_patterns(),
             'entity_rules': self.get_entity_rules()
         }
+        
+        # How documents are chunked and batched through nlp.pipe, which spaCy
+        # components aren't loaded and the entity ruler patterns for blank
+        # models, when set
+        for key in ('spacy_max_chunk_size', 'spacy_batch_size', 'spacy_n_process', 'disabled_pipes', 'entity_patterns'):
+            if key in self.config:
+                nlp_config[key] = self.config[key]
+        
+        return nlp_config
     
     def get_field_formats(self):
         """
@@ -149,7 +309,7 @@ class ConfigLoader:
         Returns:
             dict: Field formats
         """
-        return self.config.get('field_formats', {})
+        return self._copy_if_shared(self.config.get('field_formats', {}))
     
     def get_default_values(self):
         """
@@ -158,7 +318,7 @@ class ConfigLoader:
         Returns:
             dict: Default values
         """
-        return self.config.get('default_values', {})
+        return self._copy_if_shared(self.config.get('default_values', {}))
     
     def save_config(self, config_path=None):
         """
@@ -173,21 +333,20 @@ class ConfigLoader:
         save_path = config_path or self.config_path
         
         if not save_path:
-            print("No configuration path specified")
+            logger.error("No configuration path specified")
             return False
             
         try:
             # Create directory if it doesn't exist
             os.makedirs(os.path.dirname(os.path.abspath(save_path)), exist_ok=True)
             
-            with open(save_path, 'w') as f:
-                json.dump(self.config, f, indent=4)
+            json_utils.dump_file(self.config, save_path)
                 
             print(f"Configuration saved to {save_path}")
             return True
             
         except Exception as e:
-            print(f"Error saving configuration: {str(e)}")
+            logger.error(f"Error saving configuration: {str(e)}")
             return False
     
     def update_config(self, new_config):
@@ -200,5 +359,14 @@ class ConfigLoader:
         Returns:
             dict: The updated configuration
         """
+        self._check_not_shared()
+        if self._shared_config:
+            # Copy the default configuration before changing it
+            self.config = copy.deepcopy(self.config)
+            self._shared_config = False
+        
         self.config.update(new_config)
+        self.__dict__.pop('nlp_config', None)
+        if 'extraction_patterns' in new_config:
+            self._compile_patterns()
         return self.config 
\ No newline at end of file
@@ -0,0 +1,145 @@
+"""
+Hyperscan prefilter for regex patterns, used when the hyperscan package is installed
+"""
+
+import logging
+import re
+
+try:
+    import hyperscan
+except ImportError:
+    hyperscan = None
+
+logger = logging.getLogger(__name__)
+
+def _hyperscan_flags(pattern):
+    """
+    Get the Hyperscan flags equivalent to a compiled pattern's flags
+    
+    Args:
+        pattern (re.Pattern): Compiled regex pattern
+    
+    Returns:
+        int: Hyperscan compile flags
+    """
+    # Prefilter mode never misses a match (it may report extra ones) and
+    # accepts constructs such as backreferences by approximating them
+    flags = (
+        hyperscan.HS_FLAG_PREFILTER | hyperscan.HS_FLAG_SINGLEMATCH |
+        hyperscan.HS_FLAG_ALLOWEMPTY | hyperscan.HS_FLAG_UTF8 | hyperscan.HS_FLAG_UCP
+    )
+    if pattern.flags & re.IGNORECASE:
+        flags |= hyperscan.HS_FLAG_CASELESS
+    if pattern.flags & re.MULTILINE:
+        flags |= hyperscan.HS_FLAG_MULTILINE
+    if pattern.flags & re.DOTALL:
+        flags |= hyperscan.HS_FLAG_DOTALL
+    return flags
+
+def _compile_database(patterns, ids):
+    """
+    Compile patterns into a Hyperscan block mode database
+    
+    Args:
+        patterns (list): Compiled regex patterns
+        ids (list): Id reported for each pattern's matches
+    
+    Returns:
+        hyperscan.Database: The compiled database
+    """
+    database = hyperscan.Database()
+    database.compile(
+        expressions=[p.pattern.encode('utf-8') for p in patterns],
+        ids=ids,
+        elements=len(patterns),
+        flags=[_hyperscan_flags(p) for p in patterns]
+    )
+    return database
+
+class PatternPrefilter:
+    """
+    Finds which of a set of regex patterns can match a text, in a single Hyperscan scan
+    
+    The regex patterns still do the actual matching; the scan only rules out the
+    ones that can't match, so they don't have to search the text at all.
+    """
+    
+    def __init__(self, patterns):
+        """
+        Initialize the prefilter
+        
+        Args:
+            patterns (list): Compiled regex patterns
+        """
+        self.patterns = list(patterns)
+        
+        # Patterns Hyperscan can't compile are always treated as possible matches
+        self.unsupported = set()
+        supported = list(range(len(self.patterns)))
+        
+        try:
+            self.database = _compile_database(self.patterns, supported)
+        except Exception:
+            # Find the patterns that failed and compile the others without them
+            supported = []
+            for i, pattern in enumerate(self.patterns):
+                try:
+                    _compile_database([pattern], [i])
+                    supported.append(i)
+                except Exception:
+                    self.unsupported.add(pattern.pattern)
+            
+            self.database = None
+            if supported:
+                self.database = _compile_database([self.patterns[i] for i in supported], supported)
+    
+    def possible_matches(self, text):
+        """
+        Get the patterns that may match a text
+        
+        Args:
+            text (str): Text to scan
+        
+        Returns:
+            set: Sources of the patterns that may match, or None if every pattern
+                 has to be tried
+        """
+        try:
+            data = text.encode('utf-8')
+        except UnicodeEncodeError:
+            # Lone surrogates, which Hyperscan can't scan as UTF-8
+            return None
+        
+        possible = set(self.unsupported)
+        
+        if self.database is not None:
+            def on_match(pattern_id, start, end, flags, context):
+                possible.add(self.patterns[pattern_id].pattern)
+            
+            try:
+                self.database.scan(data, match_event_handler=on_match)
+            except Exception as e:
+                logger.error(f"Error scanning text with Hyperscan: {str(e)}")
+                return None
+        
+        return possible
+
+def build_prefilter(patterns):
+    """
+    Build a prefilter for regex patterns
+    
+    Args:
+        patterns (list): Compiled regex patterns
+    
+    Returns:
+        PatternPrefilter: The prefilter, or None if Hyperscan isn't installed
+                          or the patterns can't be compiled
+    """
+    if hyperscan is None or not patterns:
+        return None
+    
+    try:
+        return PatternPrefilter(patterns)
+    except Exception as e:
+        logger.error(f"Error building Hyperscan prefilter: {str(e)}")
+        return None
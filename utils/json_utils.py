@@ -0,0 +1,69 @@
+"""
+JSON helpers that use orjson when it is installed, falling back to the standard library
+"""
+
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def dumps(obj, indent=True):
+    """
+    Serialize an object to JSON
+    
+    Args:
+        obj: The object to serialize
+        indent (bool): Whether to pretty-print with two-space indentation
+        
+    Returns:
+        bytes: UTF-8 encoded JSON
+    """
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, option=option)
+        
+    return json.dumps(obj, indent=2 if indent else None).encode('utf-8')
+
+def loads(data):
+    """
+    Deserialize JSON
+    
+    Args:
+        data (bytes or str): The JSON document
+        
+    Returns:
+        The deserialized object
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+        
+    return json.loads(data)
+
+def dump_file(obj, path, indent=True):
+    """
+    Serialize an object to a JSON file
+    
+    Args:
+        obj: The object to serialize
+        path (str): Path of the file to write
+        indent (bool): Whether to pretty-print with two-space indentation
+    """
+    with open(path, 'wb') as f:
+        f.write(dumps(obj, indent))
+
+def load_file(path):
+    """
+    Deserialize a JSON file
+    
+    Args:
+        path (str): Path of the file to read
+        
+    Returns:
+        The deserialized object
+    """
+    with open(path, 'rb') as f:
+        return loads(f.read())
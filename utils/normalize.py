@@ -0,0 +1,19 @@
+"""
+Parsing of the numeric values found in documents
+"""
+
+def parse_amount(value):
+    """
+    Parse an amount such as "$1,234,567.89" into a float
+    
+    Args:
+        value (str): The amount, with an optional leading dollar sign and
+                     thousands separators
+    
+    Returns:
+        float: The amount, or None if it isn't a number
+    """
+    try:
+        return float(value.lstrip('$').replace(',', ''))
+    except ValueError:
+        return None
@@ -0,0 +1,38 @@
+"""
+Helpers for the regex flags of extraction patterns
+"""
+
+import re
+
+# Inline flags at the start of a pattern, e.g. "(?i)"
+LEADING_FLAGS_RE = re.compile(r'\A(?:\(\?[aiLmsux]+\))+')
+
+# Pattern flags that can be applied to part of a pattern, with their inline letters
+SCOPED_FLAGS = (
+    (re.IGNORECASE, 'i'),
+    (re.MULTILINE, 'm'),
+    (re.DOTALL, 's'),
+    (re.ASCII, 'a')
+)
+
+def pattern_flags(pattern_info):
+    """
+    Get the regex flags of an extraction pattern's options
+    
+    Args:
+        pattern_info (dict): Pattern options, with integer 'flags' or the older
+                             'case_insensitive' and 'multiline' switches
+        
+    Returns:
+        int: Regex flags
+    """
+    flags = pattern_info.get('flags')
+    if flags is not None:
+        return flags
+    
+    flags = 0
+    if pattern_info.get('case_insensitive', True):
+        flags |= re.IGNORECASE
+    if pattern_info.get('multiline', True):
+        flags |= re.MULTILINE
+    return flags
@@ -0,0 +1,46 @@
+import threading
+from collections import OrderedDict
+
+class TemplateCache:
+    """
+    In-memory LRU cache of parsed templates, keyed by the template content
+    """
+    
+    def __init__(self, maxsize=32):
+        """
+        Initialize the template cache
+        
+        Args:
+            maxsize (int): Maximum number of templates to keep
+        """
+        self.maxsize = maxsize
+        self._templates = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key, load):
+        """
+        Get a parsed template, loading it on a cache miss
+        
+        Args:
+            key (str): Key identifying the template content, e.g. its hash
+            load (callable): Called with no arguments to parse the template
+        
+        Returns:
+            Template: The parsed template
+        """
+        with self._lock:
+            template = self._templates.get(key)
+            if template is not None:
+                self._templates.move_to_end(key)
+                return template
+        
+        # Parse outside the lock so other requests aren't blocked meanwhile
+        template = load()
+        
+        with self._lock:
+            self._templates[key] = template
+            self._templates.move_to_end(key)
+            if len(self._templates) > self.maxsize:
+                self._templates.popitem(last=False)
+        
+        return template